@@ -5,4 +5,9 @@ PRICING_INFO = {
     'DALL-E-3': 0.040   # USD per image
 }
 
+RATE_LIMITS = {
+    'DALL-E-2': 5,  # Images per minute (OpenAI usage tier 1, raise to match your account)
+    'DALL-E-3': 5   # Images per minute (OpenAI usage tier 1, raise to match your account)
+}
+
 # ...rest of existing code...
@@ -0,0 +1,26 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+# The app is a set of top-level modules rather than a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """The app module with its library, journal and pool cache under tmp_path"""
+    # The app creates its key and library files relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    try:
+        module = importlib.import_module("wallpaper_ai_slideshow")
+    except ImportError as e:
+        pytest.skip(f"App dependencies not installed: {e}")
+    monkeypatch.setattr(module, "_quality_tier", "preview")
+    # Module-level singletons would otherwise carry state between tests
+    monkeypatch.setattr(module, "_library_pack", None)
+    monkeypatch.setattr(module, "_shared_pool", None)
+    monkeypatch.setattr(module, "_stage_samples", {})
+    yield module
+    module.close_library_pack()
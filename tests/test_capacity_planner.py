@@ -0,0 +1,78 @@
+import pytest
+
+
+@pytest.mark.parametrize("interval, minutes", [
+    ("15 minutes", 15), ("1 minute", 1), ("6 hours", 360), ("1 hour", 60),
+    ("15m", 15), ("6h", 360), (" 45 ", 45), ("Never", None), ("", None),
+])
+def test_parse_interval_minutes(app, interval, minutes):
+    assert app.parse_interval_minutes(interval) == minutes
+
+
+def test_parse_interval_minutes_rejects_garbage(app):
+    with pytest.raises(ValueError):
+        app.parse_interval_minutes("soon")
+
+
+@pytest.mark.parametrize("mix, fleet_size, expected", [
+    ({60: 0.7, 15: 0.3}, 10, {60: 7, 15: 3}),
+    ({60: 1, 30: 1, 15: 1}, 10, {60: 4, 30: 3, 15: 3}),
+    ({60: 0.5, 15: 0.5}, 3, {60: 2, 15: 1}),
+    ({60: 0.7, 15: 0.3}, 1, {60: 1, 15: 0}),
+    ({60: 2, 15: 2}, 0, {60: 0, 15: 0}),
+])
+def test_allocate_machines_sums_to_the_fleet(app, mix, fleet_size, expected):
+    counts = app.allocate_machines(mix, fleet_size)
+
+    assert counts == expected
+    assert sum(counts.values()) == fleet_size
+
+
+def test_simulate_throttling_is_zero_under_the_limit(app):
+    # 60 machines once an hour is one request a minute against a limit of five
+    assert app.simulate_throttling({60: 1.0}, 60, 5) == 0.0
+
+
+def test_simulate_throttling_matches_the_long_run_excess(app):
+    # 3000 requests an hour against 300 allowed: about nine in ten are rejected
+    share = app.simulate_throttling({60: 1.0}, 3000, 5)
+
+    assert share == pytest.approx(0.9, abs=0.01)
+    assert share == pytest.approx(app.estimate_throttled_share({60: 1.0}, 3000, 5), abs=0.01)
+
+
+def test_simulate_throttling_is_deterministic_for_a_seed(app):
+    mix = {60: 0.5, 15: 0.5}
+
+    assert app.simulate_throttling(mix, 500, 5, seed=3) == app.simulate_throttling(mix, 500, 5, seed=3)
+
+
+def test_min_sustainable_interval_keeps_throttling_within_target(app):
+    interval = app.find_min_sustainable_interval(1000, 5, generation_minutes=0.5)
+
+    assert app.simulate_throttling({interval: 1.0}, 1000, 5) <= app.PLANNER_MAX_THROTTLED_SHARE
+    # Demand cannot sustainably exceed the rate limit
+    assert interval >= 1000 / 5
+
+
+def test_min_sustainable_interval_is_bounded_by_generation_time(app):
+    assert app.find_min_sustainable_interval(1, 5, generation_minutes=2.0) == 2.0
+
+
+def test_throttled_requests_cost_no_cpu_or_disk(app):
+    stats = {stage: (1000, 1.0) for stage in app.DEFAULT_STAGE_ESTIMATES}
+    alone = app.plan_capacity({60: 1.0}, 1, stage_stats=stats)
+    crowded = app.plan_capacity({60: 1.0}, 1000, stage_stats=stats)
+
+    assert crowded['throttled_share'] > 0.5
+    kept = 1 - crowded['throttled_share']
+    assert crowded['cpu_hours_per_machine_month'] == pytest.approx(alone['cpu_hours_per_machine_month'] * kept)
+    assert crowded['disk_mb_per_machine_month'] == pytest.approx(alone['disk_mb_per_machine_month'] * kept)
+
+
+def test_unsampled_stages_do_not_feed_the_planner(app):
+    app.log_stage("pooled", "download", app.stage_clock(), sample=False)
+    assert app.load_stage_stats()['download'] == app.DEFAULT_STAGE_ESTIMATES['download']
+
+    app.log_stage("generated", "download", app.stage_clock())
+    assert app.load_stage_stats()['download'] != app.DEFAULT_STAGE_ESTIMATES['download']
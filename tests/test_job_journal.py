@@ -0,0 +1,138 @@
+import io
+import json
+import os
+
+from PIL import Image
+
+
+def make_png_bytes():
+    buffer = io.BytesIO()
+    Image.effect_mandelbrot((256, 256), (-2.0, -1.5, 1.0, 1.5), 50).convert("RGB").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, content):
+        self.content = content
+
+
+def record_applied(app, monkeypatch):
+    applied = []
+    monkeypatch.setattr(app, "resize_and_set_wallpaper", lambda source: applied.append(source))
+    return applied
+
+
+def write_download(app, job_id):
+    path = app.get_job_download_path(job_id)
+    app.write_durably(path, make_png_bytes())
+    return path
+
+
+def states(app):
+    return {job_id: job['state'] for job_id, job in app.job_journal.load().items()}
+
+
+def test_torn_last_line_is_skipped(app):
+    app.job_journal.record("a", "requested", prompt="p")
+    with open(app.JOB_JOURNAL_FILE, "ab") as f:
+        f.write(b'{"job": "b", "state": "down')
+
+    assert states(app) == {"a": "requested"}
+
+    app.job_journal.record("c", "requested", prompt="p")
+    assert states(app) == {"a": "requested", "c": "requested"}
+
+
+def test_resume_from_api_returned_downloads_saves_and_applies(app, monkeypatch):
+    applied = record_applied(app, monkeypatch)
+    monkeypatch.setattr(app.requests, "get", lambda url, timeout: FakeResponse(make_png_bytes()))
+    app.job_journal.record("a", "requested", prompt="p")
+    app.job_journal.record("a", "api_returned", url="https://example.invalid/a.png")
+
+    app.resume_incomplete_jobs(app.job_journal.incomplete())
+
+    with open(app.METADATA_FILE) as f:
+        metadata = json.load(f)
+    assert [info['prompt'] for info in metadata.values()] == ["p"]
+    assert applied == [next(iter(metadata.values()))['path']]
+    assert states(app) == {}  # Compacted away once applied
+
+
+def test_resume_from_downloaded_saves_then_applies_the_library_copy(app, monkeypatch):
+    applied = record_applied(app, monkeypatch)
+    app.job_journal.record("a", "requested", prompt="p")
+    app.job_journal.record("a", "downloaded", path=write_download(app, "a"))
+
+    app.resume_incomplete_jobs(app.job_journal.incomplete())
+
+    with open(app.METADATA_FILE) as f:
+        metadata = json.load(f)
+    assert applied == [next(iter(metadata.values()))['path']]
+    assert not os.path.exists(app.get_job_download_path("a"))
+
+
+def test_resume_from_saved_prefers_the_library_copy_over_the_download(app, monkeypatch):
+    applied = record_applied(app, monkeypatch)
+    download = write_download(app, "a")
+    saved_path = app.save_generated_image(download, "p")
+    app.job_journal.record("a", "requested", prompt="p")
+    app.job_journal.record("a", "downloaded", path=download)
+    app.job_journal.record("a", "saved", saved_path=saved_path)
+
+    app.resume_incomplete_jobs(app.job_journal.incomplete())
+
+    assert applied == [saved_path]
+    with open(app.METADATA_FILE) as f:
+        assert len(json.load(f)) == 1  # Not saved a second time
+
+
+def test_job_is_failed_after_max_attempts(app, monkeypatch):
+    applied = record_applied(app, monkeypatch)
+    monkeypatch.setattr(app, "save_generated_image", lambda *args: (_ for _ in ()).throw(OSError("disk full")))
+    app.job_journal.record("a", "requested", prompt="p")
+    app.job_journal.record("a", "downloaded", path=write_download(app, "a"))
+
+    for attempt in range(1, app.JOB_MAX_ATTEMPTS + 1):
+        app.resume_incomplete_jobs(app.job_journal.incomplete())
+        assert app.job_journal.incomplete()["a"]['attempts'] == attempt
+
+    app.resume_incomplete_jobs(app.job_journal.incomplete())
+    assert app.job_journal.incomplete() == {}
+    assert applied == []
+
+
+def test_older_jobs_are_superseded_only_after_a_newer_one_applies(app, monkeypatch):
+    applied = []
+
+    def set_wallpaper(source):
+        if "newest" in source:
+            raise OSError("cannot set wallpaper")
+        applied.append(source)
+
+    monkeypatch.setattr(app, "resize_and_set_wallpaper", set_wallpaper)
+    monkeypatch.setattr(app.job_journal, "compact", lambda: None)
+    for job_id in ("oldest", "middle", "newest"):
+        app.job_journal.record(job_id, "requested", prompt="p", save_to_library=False)
+        app.job_journal.record(job_id, "downloaded", path=write_download(app, job_id))
+
+    app.resume_incomplete_jobs(app.job_journal.incomplete())
+
+    assert applied == [app.get_job_download_path("middle")]
+    # The newest stays unfinished for the next start; only jobs older than the applied one are superseded
+    assert states(app) == {"oldest": "superseded", "middle": "applied", "newest": "downloaded"}
+
+
+def test_compaction_waits_until_the_download_is_removed(app):
+    app.job_journal.record("a", "requested", prompt="p")
+    path = write_download(app, "a")
+    app.job_journal.record("a", "downloaded", path=path)
+    with open(app.JOB_JOURNAL_FILE, "a") as f:
+        f.write(json.dumps({"job": "pad", "state": "applied", "pad": "x" * app.JOB_JOURNAL_COMPACT_BYTES}) + "\n")
+
+    app.job_journal.record("b", "requested", prompt="p")
+
+    assert os.path.exists(path)
+    app.job_journal.maybe_compact()
+    assert os.path.getsize(app.JOB_JOURNAL_FILE) < app.JOB_JOURNAL_COMPACT_BYTES
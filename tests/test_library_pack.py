@@ -0,0 +1,152 @@
+import json
+import os
+import shutil
+
+import pytest
+
+
+def open_pack(app, tmp_path, name="library.pack"):
+    return app.WallpaperPack(str(tmp_path / name))
+
+
+def test_records_use_the_documented_binary_layout(app, tmp_path):
+    pack = open_pack(app, tmp_path)
+    pack.append("a.jpg", b"AAAA")
+    pack.close()
+
+    with open(tmp_path / "library.pack", "rb") as f:
+        raw = f.read()
+    magic, version, pack_id = app.WallpaperPack.FILE_HEADER.unpack_from(raw)
+    assert (magic, version, pack_id) == (b"WPAK", 2, pack.pack_id)
+    offset = app.WallpaperPack.FILE_HEADER.size
+    assert app.WallpaperPack.RECORD.unpack_from(raw, offset) == (b"WPR1", 0, 5, 4)
+    offset += app.WallpaperPack.RECORD.size
+    assert raw[offset:] == b"a.jpgAAAA"
+
+
+def test_torn_record_is_truncated_before_appending(app, tmp_path):
+    pack = open_pack(app, tmp_path)
+    pack.append("a.jpg", b"A" * 100)
+    pack.close()
+    with open(tmp_path / "library.pack", "ab") as f:
+        f.write(b"WPR1\x00garbage")
+    os.remove(tmp_path / "library.pack.idx")
+
+    pack = open_pack(app, tmp_path)
+    pack.append("b.jpg", b"B" * 50)
+    pack.close()
+    os.remove(tmp_path / "library.pack.idx")
+
+    pack = open_pack(app, tmp_path)
+    assert sorted(pack.names()) == ["a.jpg", "b.jpg"]
+    assert pack.read("b.jpg") == b"B" * 50
+    pack.close()
+
+
+def test_dead_bytes_match_between_live_updates_and_a_rescan(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "LIBRARY_PACK_COMPACT_RATIO", 2.0)  # Keep the dead data around
+    pack = open_pack(app, tmp_path)
+    record = app.WallpaperPack.RECORD.size + len("a.jpg")
+    pack.append("a.jpg", b"A" * 100)
+    pack.append("a.jpg", b"a" * 60)
+    assert pack.dead_bytes == record + 100
+    assert pack.delete("a.jpg")
+    assert pack.dead_bytes == record + 100 + 2 * record + 60
+    live_dead_bytes = pack.dead_bytes
+    pack.close()
+    os.remove(tmp_path / "library.pack.idx")
+
+    pack = open_pack(app, tmp_path)
+    assert pack.names() == []
+    assert pack.dead_bytes == live_dead_bytes
+    pack.close()
+
+
+def test_compact_keeps_live_entries_and_renews_the_pack_id(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "LIBRARY_PACK_COMPACT_RATIO", 2.0)
+    pack = open_pack(app, tmp_path)
+    pack.append_many([("a.jpg", b"A" * 1000), ("b.jpg", b"B" * 10)])
+    pack.delete("a.jpg")
+    size_before, id_before = os.path.getsize(pack.path), pack.pack_id
+
+    assert pack.compact()
+
+    assert pack.dead_bytes == 0
+    assert pack.pack_id != id_before
+    assert os.path.getsize(pack.path) < size_before
+    assert pack.names() == ["b.jpg"]
+    assert pack.read("b.jpg") == b"B" * 10
+    pack.close()
+
+    pack = open_pack(app, tmp_path)
+    assert pack.read("b.jpg") == b"B" * 10
+    pack.close()
+
+
+def test_failed_replace_leaves_the_pack_usable(app, tmp_path, monkeypatch):
+    pack = open_pack(app, tmp_path)
+    pack.append("a.jpg", b"A" * 10)
+    real_replace = os.replace
+
+    def locked_replace(src, dst):
+        if src.endswith(".pack.tmp"):
+            raise PermissionError("pack is open elsewhere")
+        return real_replace(src, dst)
+
+    monkeypatch.setattr(app.os, "replace", locked_replace)
+    assert not pack.compact()
+    assert pack.read("a.jpg") == b"A" * 10
+    assert not os.path.exists(pack.path + ".tmp")
+    pack.close()
+
+
+def test_index_from_another_pack_is_rebuilt(app, tmp_path):
+    local = open_pack(app, tmp_path)
+    local.append_many([("a.jpg", b"local-a" * 10), ("b.jpg", b"local-b")])
+    local.close()
+    remote = open_pack(app, tmp_path, "remote.pack")
+    remote.append_many([("b.jpg", b"remote-b" * 20), ("c.jpg", b"remote-c" * 30)])
+    remote.close()
+
+    # Copy the other machine's pack over ours, leaving our stale index behind
+    shutil.copyfile(tmp_path / "remote.pack", tmp_path / "library.pack")
+
+    pack = open_pack(app, tmp_path)
+    assert sorted(pack.names()) == ["b.jpg", "c.jpg"]
+    assert pack.read("b.jpg") == b"remote-b" * 20
+    assert pack.read("c.jpg") == b"remote-c" * 30
+    pack.close()
+
+
+def test_append_many_writes_the_index_once(app, tmp_path, monkeypatch):
+    pack = open_pack(app, tmp_path)
+    saves = []
+    real_save = pack._save_index
+    monkeypatch.setattr(pack, "_save_index", lambda: (saves.append(1), real_save()))
+
+    pack.append_many((f"{i}.jpg", b"x" * i) for i in range(50))
+
+    assert len(saves) == 1
+    assert pack.read("49.jpg") == b"x" * 49
+    pack.close()
+
+
+def test_pack_library_records_metadata_before_removing_loose_files(app, monkeypatch):
+    app.ensure_wallpapers_dir()
+    path = os.path.join(app.WALLPAPERS_DIR, "a.jpg")
+    with open(path, "wb") as f:
+        f.write(b"JPEG bytes")
+    with open(app.METADATA_FILE, "w") as f:
+        json.dump({"a.jpg": {'prompt': "p", 'date': "20240101_000000", 'path': path}}, f)
+
+    def crash(path):
+        raise KeyboardInterrupt("power cut")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(app.os, "remove", crash)
+        with pytest.raises(KeyboardInterrupt):
+            app.pack_library()
+
+    with open(app.METADATA_FILE) as f:
+        assert json.load(f)["a.jpg"]['packed']
+    assert app.get_library_pack().read("a.jpg") == b"JPEG bytes"
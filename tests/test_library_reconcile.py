@@ -0,0 +1,80 @@
+import json
+import os
+
+
+def add_image(app, name, data=b"JPEG bytes"):
+    app.ensure_wallpapers_dir()
+    path = os.path.join(app.WALLPAPERS_DIR, name)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def read_metadata(app):
+    with open(app.METADATA_FILE) as f:
+        return json.load(f)
+
+
+def write_metadata(app, metadata):
+    with open(app.METADATA_FILE, "w") as f:
+        json.dump(metadata, f)
+
+
+def test_new_files_are_imported(app):
+    path = add_image(app, "dropped_in.jpg")
+
+    assert app.reconcile_library()
+
+    info = read_metadata(app)["dropped_in.jpg"]
+    assert info['prompt'] == "Imported wallpaper"
+    assert info['path'] == path
+    assert not app.reconcile_library()
+
+
+def test_renamed_files_keep_their_metadata(app):
+    path = add_image(app, "a.jpg")
+    write_metadata(app, {"a.jpg": {'prompt': "a lighthouse", 'date': "20240101_000000", 'path': path}})
+    assert not app.reconcile_library()  # Takes the first snapshot
+
+    os.rename(path, os.path.join(app.WALLPAPERS_DIR, "b.jpg"))
+    assert app.reconcile_library()
+
+    metadata = read_metadata(app)
+    assert list(metadata) == ["b.jpg"]
+    assert metadata["b.jpg"]['prompt'] == "a lighthouse"
+    assert metadata["b.jpg"]['path'] == os.path.join(app.WALLPAPERS_DIR, "b.jpg")
+
+
+def test_deleted_files_are_dropped(app):
+    path = add_image(app, "a.jpg")
+    write_metadata(app, {"a.jpg": {'prompt': "p", 'date': "20240101_000000", 'path': path}})
+    app.reconcile_library()
+
+    os.remove(path)
+    assert app.reconcile_library()
+
+    assert read_metadata(app) == {}
+
+
+def test_entries_missing_before_the_first_snapshot_are_dropped(app):
+    app.reconcile_library()
+    # An entry whose file the snapshot never saw
+    write_metadata(app, {"ghost.jpg": {'prompt': "p", 'date': "20240101_000000", 'path': "nowhere.jpg"}})
+
+    assert app.reconcile_library()
+
+    assert read_metadata(app) == {}
+
+
+def test_packed_entries_are_kept_unless_known_missing(app):
+    app.ensure_wallpapers_dir()
+    app.get_library_pack().append("p.jpg", b"packed bytes")
+    path = os.path.join(app.WALLPAPERS_DIR, "p.jpg")
+    write_metadata(app, {"p.jpg": {'prompt': "p", 'date': "20240101_000000", 'path': path, 'packed': True}})
+
+    assert not app.reconcile_library()
+    assert "p.jpg" in read_metadata(app)
+
+    assert app.reconcile_library(known_missing=["p.jpg"])
+    assert read_metadata(app) == {}
+    assert "p.jpg" not in app.get_library_pack()
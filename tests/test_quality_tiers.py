@@ -0,0 +1,43 @@
+from PIL import Image, ImageFilter
+
+
+def test_ssim_is_one_for_identical_images(app):
+    img = app.make_benchmark_image()
+
+    assert app.compute_ssim(img, img) == 1.0
+
+
+def test_ssim_sees_native_resolution_detail_and_color(app):
+    detail = Image.effect_noise((1920, 1080), 40)
+    fractal = app.make_benchmark_image().convert("L").resize((1920, 1080))
+    img = Image.merge("RGB", (detail, fractal, detail.rotate(180)))
+    softened = img.filter(ImageFilter.GaussianBlur(1))
+    # Identical luminance, so a grayscale comparison could not tell them apart
+    gray = img.convert("L").convert("RGB")
+
+    assert app.compute_ssim(img, softened) < 0.9
+    assert app.compute_ssim(img, gray) < 0.9
+
+
+def test_default_benchmark_decodes_jpeg_so_draft_is_measured(app, monkeypatch):
+    drafted = []
+    real_draft = app.draft_for_tier
+
+    def draft_for_tier(img, tier):
+        real_draft(img, tier)
+        drafted.append((tier, img.size))
+
+    monkeypatch.setattr(app, "draft_for_tier", draft_for_tier)
+    results = app.benchmark_quality_tiers(runs=1)
+
+    assert ("preview", (512, 512)) in drafted
+    assert results['preview']['ssim_vs_max'] < results['balanced']['ssim_vs_max'] < 1.0
+
+
+def test_upscale_crops_and_resizes_to_the_requested_size(app, tmp_path):
+    source = str(tmp_path / "square.png")
+    app.make_benchmark_image().save(source)
+
+    for size in ((1920, 1080), (2560, 1600), (1080, 1920)):
+        with app.Image.open(app.upscale_to_4k(source, str(tmp_path / "out.jpg"), size=size)) as img:
+            assert img.size == size
@@ -0,0 +1,95 @@
+import hashlib
+import os
+
+import pytest
+
+
+def make_pool(app, tmp_path, name):
+    backend = app.DirectoryPoolBackend(str(tmp_path / "shared"))
+    return app.SharedWallpaperPool(backend, cache_dir=str(tmp_path / name))
+
+
+def write_file(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+    return str(path)
+
+
+def test_publish_pick_and_fetch_between_machines(app, tmp_path):
+    alice = make_pool(app, tmp_path, "alice")
+    bob = make_pool(app, tmp_path, "bob")
+    original = write_file(tmp_path / "original.png", b"original bytes")
+    rendition = write_file(tmp_path / "rendition.jpg", b"rendition bytes")
+
+    digest = alice.publish(original, "nature", "a forest", rendition=rendition)
+
+    assert alice.pick("nature") is None  # Publishers have seen their own image
+    entry = bob.pick("nature")
+    assert entry['hash'] == digest
+    assert bob.pick("space") is None
+    rendition_path = bob.fetch(entry, app.POOL_RENDITION)
+    with open(rendition_path, "rb") as f:
+        assert f.read() == b"rendition bytes"
+    with open(bob.fetch(entry), "rb") as f:
+        assert f.read() == b"original bytes"
+    assert not [name for name in os.listdir(tmp_path / "bob" / "objects") if name.endswith(".tmp")]
+
+
+def test_fetch_rejects_objects_that_fail_the_hash_check(app, tmp_path):
+    alice = make_pool(app, tmp_path, "alice")
+    bob = make_pool(app, tmp_path, "bob")
+    alice.publish(write_file(tmp_path / "original.png", b"original bytes"), "nature", "p")
+    entry = bob.pick("nature")
+    write_file(os.path.join(tmp_path, "shared", *entry['original'].split("/")), b"tampered")
+
+    with pytest.raises(ValueError):
+        bob.fetch(entry)
+    assert os.listdir(tmp_path / "bob" / "objects") == []
+
+
+def test_conditional_write_refuses_a_stale_version(app, tmp_path):
+    backend = app.DirectoryPoolBackend(str(tmp_path / "shared"))
+    assert backend.read_versioned("index.json") == (None, None)
+    assert backend.write_if_unchanged("index.json", b"first", None)
+
+    data, version = backend.read_versioned("index.json")
+    assert version == hashlib.sha256(b"first").hexdigest()
+    assert backend.write_if_unchanged("index.json", b"second", version)
+    assert not backend.write_if_unchanged("index.json", b"lost update", version)
+    assert backend.read("index.json") == b"second"
+
+
+def test_publish_retries_when_another_machine_updates_the_index_first(app, tmp_path, monkeypatch):
+    alice = make_pool(app, tmp_path, "alice")
+    bob = make_pool(app, tmp_path, "bob")
+    monkeypatch.setattr(app.time, "sleep", lambda seconds: None)
+    real_read = alice.backend.read_versioned
+    raced = []
+
+    def read_then_race(name):
+        result = real_read(name)
+        if not raced:
+            # Bob publishes between Alice reading and writing the index
+            raced.append(bob.publish(write_file(tmp_path / "bob.png", b"bob"), "nature", "p"))
+        return result
+
+    monkeypatch.setattr(alice.backend, "read_versioned", read_then_race)
+    alice_digest = alice.publish(write_file(tmp_path / "alice.png", b"alice"), "nature", "p")
+
+    assert set(alice._read_index()) == {alice_digest, raced[0]}
+
+
+def test_pooled_rendition_moves_into_the_library_instead_of_being_copied(app, tmp_path):
+    alice = make_pool(app, tmp_path, "alice")
+    bob = make_pool(app, tmp_path, "bob")
+    alice.publish(
+        write_file(tmp_path / "original.png", b"original bytes"), "nature", "p",
+        rendition=write_file(tmp_path / "rendition.jpg", b"rendition bytes")
+    )
+    cached = bob.fetch(bob.pick("nature"), app.POOL_RENDITION)
+
+    saved_path = app.save_generated_image(cached, "p", processed=True, move=True)
+
+    assert not os.path.exists(cached)
+    with open(saved_path, "rb") as f:
+        assert f.read() == b"rendition bytes"
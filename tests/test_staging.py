@@ -0,0 +1,67 @@
+import os
+import time
+from contextlib import nullcontext
+
+from PIL import Image
+
+from wallpaper_staging import ApplyStager, FakeWallpaperSetter
+
+
+def process_to_setter_size(source, dest_path, size):
+    """Stand-in for upscale_to_4k: decode, resize and re-encode at the setter's resolution"""
+    with Image.open(source) as img:
+        img.convert("RGB").resize(size, Image.Resampling.LANCZOS).save(
+            dest_path, "JPEG", quality=95, optimize=True
+        )
+
+
+def make_source(path):
+    Image.effect_mandelbrot((1024, 1024), (-2.0, -1.5, 1.0, 1.5), 100).convert("RGB").save(path)
+    return str(path)
+
+
+def test_staged_apply_is_faster_than_unstaged(tmp_path):
+    setter = FakeWallpaperSetter()
+    stager = ApplyStager(setter, process_to_setter_size, staging_dir=str(tmp_path / "staged"))
+    cold_source = make_source(tmp_path / "cold.png")
+    warm_source = make_source(tmp_path / "warm.png")
+
+    stager.apply("cold", lambda: nullcontext(cold_source))
+    unstaged_ms = stager.last_latency_ms
+
+    stager.stage("warm", lambda: nullcontext(warm_source))
+    assert stager.wait("warm", timeout=60)
+    triggered_at = time.perf_counter()
+    stager.apply("warm", lambda: nullcontext(warm_source), triggered_at)
+    staged_ms = stager.last_latency_ms
+
+    assert len(setter.applied) == 2
+    assert setter.applied[-1][1] >= triggered_at
+    assert staged_ms < unstaged_ms / 10
+    assert staged_ms < 50
+
+
+def test_files_already_in_native_format_are_used_in_place(tmp_path):
+    setter = FakeWallpaperSetter()
+    stager = ApplyStager(setter, process_to_setter_size, staging_dir=str(tmp_path / "staged"))
+    final = str(tmp_path / "final.jpg")
+    Image.new("RGB", FakeWallpaperSetter.size, (10, 20, 30)).save(final, "JPEG")
+
+    stager.apply("final", lambda: nullcontext(final))
+
+    assert setter.applied[0][0] == os.path.abspath(final)
+    assert not os.path.exists(tmp_path / "staged")
+
+
+def test_sources_are_prepared_at_the_setters_resolution(tmp_path):
+    setter = FakeWallpaperSetter(size=(1920, 1080))
+    stager = ApplyStager(setter, process_to_setter_size, staging_dir=str(tmp_path / "staged"))
+    four_k = str(tmp_path / "4k.jpg")
+    Image.new("RGB", (3840, 2160), (10, 20, 30)).save(four_k, "JPEG")
+
+    stager.apply("4k", lambda: nullcontext(four_k))
+
+    applied = setter.applied[0][0]
+    assert applied != os.path.abspath(four_k)
+    with Image.open(applied) as img:
+        assert img.size == (1920, 1080)
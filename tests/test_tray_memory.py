@@ -0,0 +1,40 @@
+import importlib
+import tkinter as tk
+
+import pytest
+
+
+def import_app(tmp_path, monkeypatch):
+    # The app creates its key and library files relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    try:
+        return importlib.import_module("wallpaper_ai_slideshow")
+    except ImportError as e:
+        pytest.skip(f"App dependencies not installed: {e}")
+
+
+def test_tray_icon_image_is_built_once(tmp_path, monkeypatch):
+    app = import_app(tmp_path, monkeypatch)
+
+    assert app.get_tray_icon_image() is app.get_tray_icon_image()
+
+
+def test_tray_release_meets_idle_memory_target(tmp_path, monkeypatch):
+    app = import_app(tmp_path, monkeypatch)
+    try:
+        style = app.Style(theme="flatly")
+    except tk.TclError as e:
+        pytest.skip(f"No display available: {e}")
+    root = style.master
+    app.build_main_ui(root)
+    root.update()
+    root.withdraw()
+
+    assert app.release_gui(root)
+
+    assert app.Style.instance is None
+    assert app.Publisher.subscriber_count() == 0
+    assert app.global_library_listbox is None
+    assert not app._main_ui_widgets
+    private_mb, within_target = app.check_idle_memory()
+    assert within_target, f"{private_mb:.1f} MB private exceeds {app.TRAY_IDLE_MEMORY_TARGET_MB} MB"
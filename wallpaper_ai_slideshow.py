@@ -16,28 +16,54 @@ import random
 import ctypes
 import logging
 import json
+import copy
+import gc
+import hashlib
+import io
+import mmap
+import struct
+from contextlib import contextmanager, nullcontext
+from collections import deque
 from datetime import datetime
 import shutil
 import tempfile
+import queue
+import uuid
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 # Third-party imports
-import win32api
-import win32con
-import win32gui
-import win32process
-import win32event
-from win32api import GetLastError
-from winerror import ERROR_ALREADY_EXISTS
+try:
+    import win32api
+    import win32con
+    import win32gui
+    import win32process
+    import win32event
+    from win32api import GetLastError
+    from winerror import ERROR_ALREADY_EXISTS
+except ImportError:
+    # Windows-only; keeps the module importable elsewhere (e.g. for tests)
+    win32api = win32con = win32gui = win32process = win32event = None
+    GetLastError = None
+    ERROR_ALREADY_EXISTS = 183
 import psutil
 import requests
 from cryptography.fernet import Fernet
-import pystray
-from PIL import Image, ImageDraw, ImageEnhance, ImageFilter
+try:
+    import pystray
+except Exception:
+    # pystray picks a backend on import and fails without a desktop session
+    pystray = None
+from PIL import Image, ImageDraw, ImageEnhance, ImageFilter, ImageMath
+
+# Local imports
+from config import PRICING_INFO, RATE_LIMITS
+from wallpaper_staging import ApplyStager, WindowsWallpaperSetter, STAGING_DIR
 
 # Tkinter imports
 import tkinter as tk
 from tkinter import messagebox, Toplevel, IntVar, StringVar
 from ttkbootstrap import Style
+from ttkbootstrap.publisher import Publisher
 from ttkbootstrap.widgets import Frame, Label, Button, Entry, Checkbutton, Notebook, OptionMenu
 from tkinter.ttk import Progressbar
 
@@ -68,8 +94,52 @@ DEFAULT_PROMPTS = {
     "Beach Vistas": "A real photo of a tropical beach with crystal-clear waters, white sand, and gently swaying palm trees."
 }
 WALLPAPERS_DIR = "generated_wallpapers"
-METADATA_FILE = os.path.join(WALLPAPERS_DIR, "metadata.json")
+METADATA_FILE_NAME = "metadata.json"
+METADATA_FILE = os.path.join(WALLPAPERS_DIR, METADATA_FILE_NAME)
 TEMP_DIR = os.path.join(tempfile.gettempdir(), "wallpaper_ai_slideshow")
+LOG_FILE = "app.log"
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+LOG_MAX_BYTES = 2 * 1024 * 1024  # Rotate after 2 MB
+LOG_BACKUP_COUNT = 5  # Keep app.log.1 .. app.log.5
+TRAY_IDLE_MEMORY_TARGET_MB = 80  # Private memory ceiling while idling in the tray
+TRAY_MEMORY_CHECK_DELAY_S = 5  # Measure once the released UI has been collected
+# Shared pool: a network directory or an http(s) URL to a file server accepting GET/PUT
+SHARED_POOL_LOCATION = os.environ.get("WALLPAPER_AI_POOL", "")
+POOL_CACHE_DIR = os.path.join(WALLPAPERS_DIR, ".pool_cache")
+POOL_INDEX_NAME = "index.json"
+POOL_INDEX_TTL = 300  # Seconds before the pool index is synced again
+POOL_RENDITION = "3840x2160"
+POOL_HTTP_TIMEOUT = 30
+POOL_INDEX_RETRIES = 8  # Attempts to update the index when another machine writes it first
+POOL_LOCK_STALE_S = 30  # Age after which a directory pool's index lock is assumed abandoned
+# Processing quality: "auto", "preview", "balanced" or "max"
+DEFAULT_QUALITY_TIER = os.environ.get("WALLPAPER_AI_QUALITY", "max")
+AUTO_TIER_BUDGET_MS = 1500  # "auto" picks the best tier that processes one image within this
+JOB_JOURNAL_FILE = os.path.join(WALLPAPERS_DIR, "jobs.journal")
+JOBS_DIR = os.path.join(WALLPAPERS_DIR, ".jobs")  # Downloads kept until their job is applied
+JOB_JOURNAL_COMPACT_BYTES = 256 * 1024
+JOB_TERMINAL_STATES = ("applied", "superseded", "failed", "abandoned")
+JOB_MAX_ATTEMPTS = 3  # Resume attempts before an interrupted job is given up as failed
+LIBRARY_SNAPSHOT_FILE = os.path.join(WALLPAPERS_DIR, ".snapshot.json")
+LIBRARY_IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+LIBRARY_RECONCILE_INTERVAL_MS = 5 * 60 * 1000
+# Optional single-file library storage (set WALLPAPER_AI_PACK=1 to store new wallpapers there)
+USE_LIBRARY_PACK = os.environ.get("WALLPAPER_AI_PACK", "") not in ("", "0")
+LIBRARY_PACK_FILE = os.path.join(WALLPAPERS_DIR, "library.pack")
+LIBRARY_PACK_COMPACT_RATIO = 0.25  # Compact once this share of the pack is deleted data
+# Capacity planning
+IMAGE_MODEL = 'DALL-E-3'
+STAGE_STATS_FILE = os.path.join(WALLPAPERS_DIR, "stage_stats.json")
+STAGE_STATS_SAMPLES = 50  # Recent samples kept per stage
+DEFAULT_STAGE_ESTIMATES = {  # (wall ms, CPU seconds) used until real generations are measured
+    'api_request': (15000, 0.05),
+    'download': (2000, 0.05),
+    'process': (3000, 2.5),
+    'apply': (1500, 1.0),
+}
+DEFAULT_WALLPAPER_BYTES = 3 * 1024 * 1024  # Typical 4K JPEG when the library is empty
+PLANNER_SIMULATED_DAYS = 1
+PLANNER_MAX_THROTTLED_SHARE = 0.01  # Highest throttled share still considered sustainable
 
 # Initialize logger at module level
 logger = logging.getLogger(__name__)
@@ -97,20 +167,303 @@ class EncryptionManager:
 # Create global encryption manager
 encryption_manager = EncryptionManager()
 
+class JsonLinesFormatter(logging.Formatter):
+    """Format records as one JSON object per line for machine analysis"""
+    EXTRA_FIELDS = ('job_id', 'stage', 'duration_ms', 'cpu_ms')
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        for field in self.EXTRA_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+class InProcessQueueHandler(QueueHandler):
+    """QueueHandler that leaves exception info on the record for the listener's formatters.
+
+    The stock prepare() folds the traceback into the message and clears
+    exc_info, which is only needed when records cross a process boundary.
+    """
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+# Listener that drains the log queue on its own thread
+_log_listener = None
+
 # Add debug logging
-def setup_logging():
-    import logging
-    log_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.log')
-    logging.basicConfig(
-        filename=log_file,
-        level=logging.DEBUG,
-        format='%(asctime)s - %(levelname)s - %(message)s'
+def setup_logging(level=None, json_format=None):
+    """Route all logging through a queue so callers never block on disk I/O.
+
+    The level defaults to INFO (override with WALLPAPER_AI_LOG_LEVEL) and the
+    file format to plain text (set WALLPAPER_AI_LOG_JSON=1 for JSON lines).
+    """
+    global _log_listener
+    if level is None:
+        level = os.environ.get('WALLPAPER_AI_LOG_LEVEL', 'INFO').upper()
+    if json_format is None:
+        json_format = os.environ.get('WALLPAPER_AI_LOG_JSON', '') not in ('', '0')
+
+    log_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), LOG_FILE)
+    file_handler = RotatingFileHandler(
+        log_file,
+        maxBytes=LOG_MAX_BYTES,
+        backupCount=LOG_BACKUP_COUNT,
+        encoding='utf-8',
+        delay=True
     )
+    file_handler.setFormatter(JsonLinesFormatter() if json_format else logging.Formatter(LOG_FORMAT))
+
     # Also log to console when running from exe
     console = logging.StreamHandler()
-    console.setLevel(logging.DEBUG)
-    logging.getLogger('').addHandler(console)
-    return logging.getLogger()
+    console.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    root_logger = logging.getLogger()
+    for handler in root_logger.handlers[:]:
+        root_logger.removeHandler(handler)
+    root_logger.addHandler(InProcessQueueHandler(log_queue))
+    root_logger.setLevel(level)
+
+    if _log_listener is not None:
+        _log_listener.stop()
+    _log_listener = QueueListener(log_queue, file_handler, console, respect_handler_level=True)
+    _log_listener.start()
+    return root_logger
+
+def set_debug_logging(enabled):
+    """Switch the root logger between DEBUG and INFO at runtime"""
+    logging.getLogger().setLevel(logging.DEBUG if enabled else logging.INFO)
+    logger.info(f"Debug logging {'enabled' if enabled else 'disabled'}")
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread"""
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+
+# Recent (wall ms, CPU seconds) samples per stage, fed to the capacity planner
+_stage_samples = {}
+_stage_samples_lock = threading.Lock()
+
+def stage_clock():
+    """Wall clock and CPU time of the calling thread, for log_stage"""
+    return time.perf_counter(), time.thread_time()
+
+def log_stage(job_id, stage, started, sample=True):
+    """Log how long a generation stage took, tagged with its job ID; sample=False keeps it out of the planner"""
+    now = stage_clock()
+    duration_ms = round((now[0] - started[0]) * 1000, 1)
+    cpu_ms = round((now[1] - started[1]) * 1000, 1)
+    logger.info(
+        f"Job {job_id}: {stage} finished in {duration_ms} ms ({cpu_ms} ms CPU)",
+        extra={'job_id': job_id, 'stage': stage, 'duration_ms': duration_ms, 'cpu_ms': cpu_ms}
+    )
+    if sample:
+        with _stage_samples_lock:
+            samples = _stage_samples.setdefault(stage, deque(maxlen=STAGE_STATS_SAMPLES))
+            samples.append((duration_ms, cpu_ms / 1000))
+    return stage_clock()
+
+def restore_stage_samples():
+    """Seed the in-memory samples from STAGE_STATS_FILE so saving extends the history"""
+    try:
+        with open(STAGE_STATS_FILE, 'r') as f:
+            saved = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return
+    with _stage_samples_lock:
+        for stage, samples in saved.items():
+            # Saved samples are older than anything measured since startup
+            current = list(_stage_samples.get(stage, ()))
+            _stage_samples[stage] = deque(
+                [tuple(x) for x in samples] + current, maxlen=STAGE_STATS_SAMPLES
+            )
+
+def load_stage_stats():
+    """Average (wall ms, CPU seconds) per stage from restored and new samples"""
+    stats = {}
+    with _stage_samples_lock:
+        for stage, default in DEFAULT_STAGE_ESTIMATES.items():
+            samples = list(_stage_samples.get(stage, ()))
+            if samples:
+                stats[stage] = (
+                    sum(wall for wall, _ in samples) / len(samples),
+                    sum(cpu for _, cpu in samples) / len(samples)
+                )
+            else:
+                stats[stage] = default
+    return stats
+
+def save_stage_stats():
+    """Persist recent stage samples so headless reports use measured values"""
+    with _stage_samples_lock:
+        data = {stage: list(samples) for stage, samples in _stage_samples.items()}
+    if not data:
+        return
+    try:
+        ensure_wallpapers_dir()
+        with open(STAGE_STATS_FILE, 'w') as f:
+            json.dump(data, f)
+    except OSError as e:
+        logger.warning(f"Failed to save stage stats: {e}")
+
+def parse_interval_minutes(interval):
+    """Minutes for an interval such as "15 minutes", "6 hours", "15m" or "6h"; None for "Never" """
+    interval = interval.strip().lower()
+    if interval in ("", "never"):
+        return None
+    for suffix, factor in (("minutes", 1), ("minute", 1), ("m", 1), ("hours", 60), ("hour", 60), ("h", 60)):
+        if interval.endswith(suffix):
+            return float(interval[:-len(suffix)].strip()) * factor
+    return float(interval)
+
+def get_average_wallpaper_bytes():
+    """Mean size of library images, or DEFAULT_WALLPAPER_BYTES when there are none"""
+    sizes = []
+    try:
+        with os.scandir(WALLPAPERS_DIR) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.lower().endswith(LIBRARY_IMAGE_EXTENSIONS):
+                    sizes.append(entry.stat().st_size)
+    except FileNotFoundError:
+        pass
+    return sum(sizes) / len(sizes) if sizes else DEFAULT_WALLPAPER_BYTES
+
+def allocate_machines(schedule_mix, fleet_size):
+    """Split the fleet between intervals by share so the counts add up to fleet_size"""
+    total_share = sum(schedule_mix.values())
+    quotas = {interval: fleet_size * share / total_share for interval, share in schedule_mix.items()}
+    counts = {interval: int(quota) for interval, quota in quotas.items()}
+    # Largest remainder: hand the machines lost to rounding down to the biggest fractions
+    by_remainder = sorted(quotas, key=lambda interval: quotas[interval] - counts[interval], reverse=True)
+    for interval in by_remainder[:fleet_size - sum(counts.values())]:
+        counts[interval] += 1
+    return counts
+
+def estimate_throttled_share(schedule_mix, fleet_size, rate_limit_per_minute):
+    """Long-run share of requests above the rate limit; a cheap stand-in for simulate_throttling"""
+    total_share = sum(schedule_mix.values())
+    requests_per_minute = fleet_size * sum(share / total_share / interval for interval, share in schedule_mix.items())
+    if requests_per_minute <= rate_limit_per_minute:
+        return 0.0
+    return 1 - rate_limit_per_minute / requests_per_minute
+
+def estimate_monthly_spend(schedule_mix, fleet_size=1, model=IMAGE_MODEL, rate_limit_per_minute=None):
+    """(API spend per month, throttled share) without simulating, for live UI updates"""
+    if rate_limit_per_minute is None:
+        rate_limit_per_minute = RATE_LIMITS[model]
+    total_share = sum(schedule_mix.values())
+    images = fleet_size * sum(share / total_share * 30 * 24 * 60 / interval for interval, share in schedule_mix.items())
+    throttled_share = estimate_throttled_share(schedule_mix, fleet_size, rate_limit_per_minute)
+    return images * (1 - throttled_share) * PRICING_INFO[model], throttled_share
+
+def simulate_throttling(schedule_mix, fleet_size, rate_limit_per_minute, days=PLANNER_SIMULATED_DAYS, seed=0):
+    """Share of API requests a token bucket at the rate limit would reject.
+
+    Each machine runs its interval from a random phase, as machines are started
+    at unrelated times. The bucket holds one minute of requests.
+    """
+    rng = random.Random(seed)
+    horizon = days * 24 * 60
+    arrivals = []
+    for interval, machines in allocate_machines(schedule_mix, fleet_size).items():
+        for _ in range(machines):
+            t = rng.uniform(0, interval)
+            while t < horizon:
+                arrivals.append(t)
+                t += interval
+    if not arrivals:
+        return 0.0
+    arrivals.sort()
+
+    tokens = float(rate_limit_per_minute)
+    last = 0.0
+    throttled = 0
+    for t in arrivals:
+        tokens = min(rate_limit_per_minute, tokens + (t - last) * rate_limit_per_minute)
+        last = t
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            throttled += 1
+    return throttled / len(arrivals)
+
+def find_min_sustainable_interval(fleet_size, rate_limit_per_minute, generation_minutes):
+    """Shortest interval (minutes) a uniform fleet can run without exceeding PLANNER_MAX_THROTTLED_SHARE"""
+    # A machine cannot start a new generation before the last one finished
+    low = max(generation_minutes, 0.5 * fleet_size / rate_limit_per_minute)
+    high = max(24 * 60, 10 * fleet_size / rate_limit_per_minute)
+    if simulate_throttling({low: 1.0}, fleet_size, rate_limit_per_minute) <= PLANNER_MAX_THROTTLED_SHARE:
+        return low
+    for _ in range(20):
+        middle = (low + high) / 2
+        if simulate_throttling({middle: 1.0}, fleet_size, rate_limit_per_minute) <= PLANNER_MAX_THROTTLED_SHARE:
+            high = middle
+        else:
+            low = middle
+    return high
+
+def plan_capacity(schedule_mix, fleet_size=1, model=IMAGE_MODEL, rate_limit_per_minute=None, stage_stats=None):
+    """Predict spend, throttling, local load and the sustainable interval for a fleet.
+
+    schedule_mix maps an interval in minutes to the share of machines using it.
+    """
+    if rate_limit_per_minute is None:
+        rate_limit_per_minute = RATE_LIMITS[model]
+    if stage_stats is None:
+        stage_stats = load_stage_stats()
+    total_share = sum(schedule_mix.values())
+    schedule_mix = {interval: share / total_share for interval, share in schedule_mix.items()}
+
+    generation_seconds = sum(wall for wall, _ in stage_stats.values()) / 1000
+    cpu_seconds_per_image = sum(cpu for _, cpu in stage_stats.values())
+    images_per_machine = sum(share * 30 * 24 * 60 / interval for interval, share in schedule_mix.items())
+    fleet_images = images_per_machine * fleet_size
+    throttled_share = simulate_throttling(schedule_mix, fleet_size, rate_limit_per_minute)
+    # Throttled requests produce no image, so they cost no local CPU or disk either
+    generated_per_machine = images_per_machine * (1 - throttled_share)
+
+    return {
+        'model': model,
+        'fleet_size': fleet_size,
+        'rate_limit_per_minute': rate_limit_per_minute,
+        'images_per_month': fleet_images,
+        'api_spend_per_month': fleet_images * (1 - throttled_share) * PRICING_INFO[model],
+        'throttled_share': throttled_share,
+        'generation_seconds': generation_seconds,
+        'cpu_hours_per_machine_month': generated_per_machine * cpu_seconds_per_image / 3600,
+        'disk_mb_per_machine_month': generated_per_machine * get_average_wallpaper_bytes() / (1024 * 1024),
+        'min_sustainable_interval_minutes': find_min_sustainable_interval(
+            fleet_size, rate_limit_per_minute, generation_seconds / 60
+        ),
+    }
+
+def format_capacity_report(plan):
+    return "\n".join([
+        f"Fleet: {plan['fleet_size']} machine(s), {plan['model']} at {plan['rate_limit_per_minute']} images/min",
+        f"Images requested: {plan['images_per_month']:,.0f}/month",
+        f"Predicted API spend: ${plan['api_spend_per_month']:,.2f}/month",
+        f"Throttled requests: {plan['throttled_share']:.1%}",
+        f"Generation time: {plan['generation_seconds']:.1f} s per image",
+        f"Local CPU: {plan['cpu_hours_per_machine_month']:.2f} CPU-hours/month per machine",
+        f"Disk growth: {plan['disk_mb_per_machine_month']:,.0f} MB/month per machine",
+        f"Minimum sustainable interval: {plan['min_sustainable_interval_minutes']:.1f} minutes",
+    ])
 
 def kill_existing_instances():
     try:
@@ -178,49 +531,127 @@ def get_temp_path(filename):
     os.makedirs(TEMP_DIR, exist_ok=True)
     return os.path.join(TEMP_DIR, filename)
 
+# Enhancement steps shared by the quality tiers, applied in this order
+ENHANCEMENT_STEPS = {
+    'sharpness': lambda img: ImageEnhance.Sharpness(img).enhance(1.3),  # Slight sharpness boost
+    'unsharp_mask': lambda img: img.filter(ImageFilter.UnsharpMask(radius=2, percent=150, threshold=3)),
+    'color': lambda img: ImageEnhance.Color(img).enhance(1.1),  # Subtle color boost
+    'contrast': lambda img: ImageEnhance.Contrast(img).enhance(1.1),  # Subtle contrast boost
+    'brightness': lambda img: ImageEnhance.Brightness(img).enhance(1.05),  # Very subtle brightness boost
+}
+
+# Named processing tiers, from fastest to highest quality
+QUALITY_TIERS = {
+    'preview': {
+        'resample': Image.Resampling.BILINEAR,
+        'reducing_gap': 2.0,
+        'draft_scale': 2,  # Let JPEG decode at half resolution
+        'enhancements': (),
+    },
+    'balanced': {
+        'resample': Image.Resampling.BICUBIC,
+        'reducing_gap': 3.0,
+        'draft_scale': None,
+        'enhancements': ('sharpness', 'color', 'contrast'),
+    },
+    'max': {
+        'resample': Image.Resampling.LANCZOS,
+        'reducing_gap': None,
+        'draft_scale': None,
+        'enhancements': tuple(ENHANCEMENT_STEPS),
+    },
+}
+
+_quality_tier = DEFAULT_QUALITY_TIER
+_auto_quality_tier = None
+
+def set_quality_tier(tier):
+    """Select the processing tier used by upscale_to_4k ("auto" or a QUALITY_TIERS name)"""
+    global _quality_tier
+    if tier != "auto" and tier not in QUALITY_TIERS:
+        raise ValueError(f"Unknown quality tier: {tier}")
+    _quality_tier = tier
+    logger.info(f"Processing quality set to {tier}")
+
+def make_benchmark_image():
+    """Deterministic, detailed 1024x1024 test image matching DALL-E output size"""
+    return Image.effect_mandelbrot((1024, 1024), (-2.0, -1.5, 1.0, 1.5), 100).convert("RGB")
+
+def resolve_quality_tier(tier=None):
+    """Map a tier name to a concrete tier, measuring this device once for "auto" """
+    global _auto_quality_tier
+    tier = tier or _quality_tier
+    if tier != "auto":
+        if tier not in QUALITY_TIERS:
+            logger.warning(f"Unknown quality tier {tier}, using max")
+            return "max"
+        return tier
+    if _auto_quality_tier is None:
+        sample = make_benchmark_image()
+        _auto_quality_tier = "preview"
+        # Try the best tier first and settle on the first one that is fast enough
+        for name in ("max", "balanced"):
+            started = time.perf_counter()
+            process_to_4k(sample, name)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            logger.debug(f"Auto quality: {name} took {elapsed_ms:.0f} ms")
+            if elapsed_ms <= AUTO_TIER_BUDGET_MS:
+                _auto_quality_tier = name
+                break
+        logger.info(f"Auto quality selected {_auto_quality_tier} tier")
+    return _auto_quality_tier
+
+def draft_for_tier(img, tier):
+    """Ask the JPEG decoder for the tier's reduced scale; a no-op for other formats"""
+    scale = QUALITY_TIERS[tier]['draft_scale']
+    if scale:
+        # draft() picks the smallest DCT scale still at least this size, so the
+        # request has to be below the source size to reduce anything
+        img.draft("RGB", (max(1, img.width // scale), max(1, img.height // scale)))
+
+def process_to_4k(img, tier="max", size=(3840, 2160)):
+    """Crop to the target aspect ratio, resize to size (4K by default) and enhance according to the tier"""
+    settings = QUALITY_TIERS[tier]
+    target_width, target_height = size
+
+    # Center-crop images of another shape (e.g. square DALL-E output) to the screen's aspect ratio
+    if img.width * target_height > img.height * target_width:
+        crop_width = img.height * target_width // target_height
+        left_margin = (img.width - crop_width) // 2
+        img = img.crop((left_margin, 0, left_margin + crop_width, img.height))
+        logger.debug(f"Cropped image to {target_width}:{target_height} ratio")
+    elif img.width * target_height < img.height * target_width:
+        crop_height = img.width * target_height // target_width
+        top_margin = (img.height - crop_height) // 2
+        img = img.crop((0, top_margin, img.width, top_margin + crop_height))
+        logger.debug(f"Cropped image to {target_width}:{target_height} ratio")
+    
+    img_resized = img.resize(
+        (target_width, target_height),
+        settings['resample'],
+        reducing_gap=settings['reducing_gap']
+    )
+    
+    # Apply image enhancements
+    try:
+        img_enhanced = img_resized
+        for step in settings['enhancements']:
+            img_enhanced = ENHANCEMENT_STEPS[step](img_enhanced)
+        if settings['enhancements']:
+            logger.debug("Applied image enhancements successfully")
+    except Exception as e:
+        logger.warning(f"Image enhancement failed, using original resized image: {e}")
+        img_enhanced = img_resized
+    return img_enhanced
+
 # Replace upscale_to_4k function
-def upscale_to_4k(image_path, save_path=None):
-    """Upscale image to 4K (3840x2160) with improved quality and crop to 16:9"""
-    target_width = 3840
-    target_height = 2160
+def upscale_to_4k(image_path, save_path=None, tier=None, size=(3840, 2160)):
+    """Upscale image to size (4K by default) with improved quality, cropped to its aspect ratio"""
+    tier = resolve_quality_tier(tier)
 
     with Image.open(image_path) as img:
-        # If image is square (from DALL-E), crop it to 16:9
-        if img.width == img.height:
-            crop_height = img.width * 9 // 16
-            top_margin = (img.height - crop_height) // 2
-            img = img.crop((0, top_margin, img.width, top_margin + crop_height))
-            logger.debug(f"Cropped square image to 16:9 ratio")
-        
-        # High quality resize to 4K using Lanczos
-        img_resized = img.resize((target_width, target_height), Image.Resampling.LANCZOS)
-        
-        # Apply image enhancements
-        try:
-            # Apply subtle sharpening
-            sharpener = ImageEnhance.Sharpness(img_resized)
-            img_enhanced = sharpener.enhance(1.3)  # Slight sharpness boost
-            
-            # Apply noise reduction
-            img_enhanced = img_enhanced.filter(ImageFilter.UnsharpMask(radius=2, percent=150, threshold=3))
-            
-            # Enhance color
-            color_enhancer = ImageEnhance.Color(img_enhanced)
-            img_enhanced = color_enhancer.enhance(1.1)  # Subtle color boost
-            
-            # Adjust contrast
-            contrast = ImageEnhance.Contrast(img_enhanced)
-            img_enhanced = contrast.enhance(1.1)  # Subtle contrast boost
-            
-            # Adjust brightness
-            brightness = ImageEnhance.Brightness(img_enhanced)
-            img_enhanced = brightness.enhance(1.05)  # Very subtle brightness boost
-            
-            logger.debug("Applied image enhancements successfully")
-            
-        except Exception as e:
-            logger.warning(f"Image enhancement failed, using original resized image: {e}")
-            img_enhanced = img_resized
+        draft_for_tier(img, tier)
+        img_enhanced = process_to_4k(img, tier, size)
         
         # Save with high quality
         if save_path:
@@ -231,12 +662,82 @@ def upscale_to_4k(image_path, save_path=None):
             img_enhanced.save(upscale_path, "JPEG", quality=95, optimize=True)
             return upscale_path
 
+def compute_ssim(img_a, img_b, window=8):
+    """Mean SSIM of two same-size images over 8x8 windows at native resolution, averaged over R, G and B"""
+    c1 = (0.01 * 255) ** 2
+    c2 = (0.03 * 255) ** 2
+    scores = []
+    for band_a, band_b in zip(img_a.convert("RGB").split(), img_b.convert("RGB").split()):
+        x = band_a.convert("F")
+        y = band_b.convert("F")
+        # reduce() averages each window in C, giving the local means of x, y, x², y² and xy
+        moments = {
+            'mx': x.reduce(window),
+            'my': y.reduce(window),
+            'mxx': ImageMath.lambda_eval(lambda v: v['x'] * v['x'], x=x).reduce(window),
+            'myy': ImageMath.lambda_eval(lambda v: v['y'] * v['y'], y=y).reduce(window),
+            'mxy': ImageMath.lambda_eval(lambda v: v['x'] * v['y'], x=x, y=y).reduce(window),
+        }
+        ssim_map = ImageMath.lambda_eval(
+            lambda v: ((v['mx'] * v['my'] * 2 + c1) * ((v['mxy'] - v['mx'] * v['my']) * 2 + c2))
+            / ((v['mx'] * v['mx'] + v['my'] * v['my'] + c1)
+               * (v['mxx'] - v['mx'] * v['mx'] + v['myy'] - v['my'] * v['my'] + c2)),
+            **moments
+        )
+        scores.append(ssim_map.resize((1, 1), Image.Resampling.BOX).getpixel((0, 0)))
+    return sum(scores) / len(scores)
+
+def benchmark_quality_tiers(image_path=None, runs=3):
+    """Time each tier (decode, process, JPEG encode) and score it against "max" with SSIM"""
+    if image_path is None:
+        # Decode from JPEG like real downloads, so the tiers' reduced-scale decode is measured too
+        buffer = io.BytesIO()
+        make_benchmark_image().save(buffer, "JPEG", quality=95)
+        sample = buffer.getvalue()
+    results = {}
+    outputs = {}
+    for tier in QUALITY_TIERS:
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            with Image.open(image_path or io.BytesIO(sample)) as img:
+                draft_for_tier(img, tier)
+                output = process_to_4k(img, tier)
+            output.save(io.BytesIO(), "JPEG", quality=95, optimize=True)
+            timings.append((time.perf_counter() - started) * 1000)
+        outputs[tier] = output
+        results[tier] = {'ms_per_image': round(sum(timings) / len(timings), 1)}
+    for tier, output in outputs.items():
+        results[tier]['ssim_vs_max'] = round(compute_ssim(output, outputs['max']), 4)
+    return results
+
+_apply_stager = None
+
+def get_apply_stager():
+    global _apply_stager
+    if _apply_stager is None:
+        _apply_stager = ApplyStager(WindowsWallpaperSetter(), upscale_to_4k)
+    return _apply_stager
+
+def set_wallpaper_setter(setter):
+    """Swap the platform setter, e.g. for a FakeWallpaperSetter"""
+    get_apply_stager().setter = setter
+
+def get_source_key(image_path):
+    """Staging key for a file; changes whenever the file or the quality tier does"""
+    stat = os.stat(image_path)
+    return f"{os.path.abspath(image_path)}:{stat.st_mtime_ns}:{stat.st_size}:{_quality_tier}"
+
 # Function to resize and set wallpaper
 def resize_and_set_wallpaper(image_path):
-    upscaled_path = upscale_to_4k(image_path)
-    abs_path = os.path.abspath(upscaled_path)
-    ctypes.windll.user32.SystemParametersInfoW(20, 0, abs_path, 0)
-    return "Wallpaper has been updated successfully!"
+    if isinstance(image_path, str):
+        key = get_source_key(image_path)
+    else:
+        key = f"stream:{uuid.uuid4().hex}"
+    return get_apply_stager().apply(key, lambda: nullcontext(image_path))
+
+# Guards metadata.json against concurrent writes from worker threads
+_metadata_lock = threading.Lock()
 
 def ensure_wallpapers_dir():
     """Ensure wallpapers directory exists and load metadata"""
@@ -246,8 +747,12 @@ def ensure_wallpapers_dir():
             json.dump({}, f)
 
 # Modify save_generated_image function to save only final version
-def save_generated_image(image_path, prompt):
-    """Save generated image with metadata"""
+def save_generated_image(image_path, prompt, processed=False, tier=None, move=False):
+    """Save generated image with metadata; processed images are copied (or with move, moved) as-is.
+
+    Returns the library path. With the library pack enabled no file exists
+    there, so read the result back with open_saved_image().
+    """
     ensure_wallpapers_dir()
     
     # Create unique filename based on timestamp
@@ -256,23 +761,957 @@ def save_generated_image(image_path, prompt):
     filepath = os.path.join(WALLPAPERS_DIR, filename)
     
     # Process image to 4K and save directly to library
-    upscale_to_4k(image_path, filepath)
+    if processed and move:
+        shutil.move(image_path, filepath)
+    elif processed:
+        shutil.copyfile(image_path, filepath)
+    else:
+        upscale_to_4k(image_path, filepath, tier)
     
-    # Update metadata
-    with open(METADATA_FILE, 'r') as f:
-        metadata = json.load(f)
-    
-    metadata[filename] = {
-        'prompt': prompt,
-        'date': timestamp,
-        'path': filepath
-    }
+    packed = False
+    if USE_LIBRARY_PACK:
+        with open(filepath, "rb") as f:
+            get_library_pack().append(filename, f.read())
+        os.remove(filepath)
+        packed = True
     
-    with open(METADATA_FILE, 'w') as f:
-        json.dump(metadata, f, indent=2)
+    # Update metadata
+    with _metadata_lock:
+        with open(METADATA_FILE, 'r') as f:
+            metadata = json.load(f)
+        
+        metadata[filename] = {
+            'prompt': prompt,
+            'date': timestamp,
+            'path': filepath
+        }
+        if packed:
+            metadata[filename]['packed'] = True
+        
+        with open(METADATA_FILE, 'w') as f:
+            json.dump(metadata, f, indent=2)
     
     return filepath
 
+class _PackEntryReader(io.RawIOBase):
+    """Seekable read-only stream over a memoryview, so Pillow can decode straight from the mmap"""
+    def __init__(self, view):
+        self.view = view
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = min(len(buffer), len(self.view) - self.pos)
+        buffer[:count] = self.view[self.pos:self.pos + count]
+        self.pos += count
+        return count
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.pos
+        elif whence == io.SEEK_END:
+            offset += len(self.view)
+        self.pos = max(0, offset)
+        return self.pos
+
+    def tell(self):
+        return self.pos
+
+class WallpaperPack:
+    """Append-only pack of encoded images read through mmap.
+
+    Records are a small header (magic, flags, name length, data length) followed by
+    the name and the encoded bytes. Deletions append a tombstone record. A binary
+    side index of name -> (offset, length) is rebuilt incrementally from the tail
+    of the pack whenever the pack has grown past what the index covers.
+
+    The file header carries a random pack ID, renewed on compaction, that the
+    index repeats; an index belonging to any other pack is ignored and rebuilt.
+    """
+    FILE_HEADER = struct.Struct("<4sB3x16s")
+    PACK_MAGIC = b"WPAK"
+    PACK_VERSION = 2
+    RECORD = struct.Struct("<4sBHQ")
+    RECORD_MAGIC = b"WPR1"
+    FLAG_DELETED = 1
+    INDEX_HEADER = struct.Struct("<4s16sQQI")
+    INDEX_ENTRY = struct.Struct("<QQH")
+
+    def __init__(self, path=LIBRARY_PACK_FILE):
+        self.path = path
+        self.index_path = path + ".idx"
+        self.lock = threading.RLock()
+        self.entries = {}
+        self.dead_bytes = 0
+        self.pack_id = None
+        self._file = None
+        self._mmap = None
+        self._open()
+
+    def _new_header(self):
+        return self.FILE_HEADER.pack(self.PACK_MAGIC, self.PACK_VERSION, uuid.uuid4().bytes)
+
+    def _open(self):
+        if not os.path.exists(self.path):
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "wb") as f:
+                f.write(self._new_header())
+        self._file = open(self.path, "rb")
+        try:
+            magic, version, self.pack_id = self.FILE_HEADER.unpack(self._file.read(self.FILE_HEADER.size))
+        except struct.error:
+            magic, version = None, None
+        if magic != self.PACK_MAGIC or version != self.PACK_VERSION:
+            self._file.close()
+            raise ValueError(f"Not a wallpaper pack: {self.path}")
+        self._load_index()
+        self._remap()
+
+    def _remap(self):
+        # Views handed out earlier keep the old map alive until they are released
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _load_index(self):
+        pack_size = os.path.getsize(self.path)
+        scanned_to = self.FILE_HEADER.size
+        self.entries = {}
+        self.dead_bytes = 0
+        try:
+            with open(self.index_path, "rb") as f:
+                magic, pack_id, indexed_size, dead_bytes, count = self.INDEX_HEADER.unpack(
+                    f.read(self.INDEX_HEADER.size)
+                )
+                # An index left over from another pack (e.g. one copied in from another machine) is useless
+                if magic == b"WIDX" and pack_id == self.pack_id and indexed_size <= pack_size:
+                    entries = {}
+                    for _ in range(count):
+                        offset, length, name_len = self.INDEX_ENTRY.unpack(f.read(self.INDEX_ENTRY.size))
+                        entries[f.read(name_len).decode("utf-8")] = (offset, length)
+                    self.entries, self.dead_bytes, scanned_to = entries, dead_bytes, indexed_size
+        except (FileNotFoundError, struct.error, UnicodeDecodeError):
+            pass
+        if scanned_to < pack_size:
+            valid_end = self._scan(scanned_to, pack_size)
+            if valid_end < pack_size:
+                # Cut off the torn record so later appends stay reachable by a rescan
+                os.truncate(self.path, valid_end)
+            self._save_index()
+
+    def _scan(self, offset, end):
+        """Replay records between offset and end into the in-memory index; returns where valid records end"""
+        self._file.seek(offset)
+        while offset + self.RECORD.size <= end:
+            magic, flags, name_len, data_len = self.RECORD.unpack(self._file.read(self.RECORD.size))
+            if magic != self.RECORD_MAGIC or offset + self.RECORD.size + name_len + data_len > end:
+                logger.warning(f"Truncated or corrupt pack record at offset {offset}, ignoring the rest")
+                break
+            name = self._file.read(name_len).decode("utf-8")
+            data_offset = offset + self.RECORD.size + name_len
+            record_size = self.RECORD.size + name_len + data_len
+            if name in self.entries:
+                self.dead_bytes += self.RECORD.size + len(name.encode("utf-8")) + self.entries[name][1]
+            if flags & self.FLAG_DELETED:
+                self.entries.pop(name, None)
+                self.dead_bytes += record_size
+            else:
+                self.entries[name] = (data_offset, data_len)
+            offset += record_size
+            self._file.seek(offset)
+        return offset
+
+    def _save_index(self):
+        parts = [self.INDEX_HEADER.pack(
+            b"WIDX", self.pack_id, os.path.getsize(self.path), self.dead_bytes, len(self.entries)
+        )]
+        for name, (offset, length) in self.entries.items():
+            encoded = name.encode("utf-8")
+            parts.append(self.INDEX_ENTRY.pack(offset, length, len(encoded)))
+            parts.append(encoded)
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(b"".join(parts))
+        os.replace(tmp_path, self.index_path)
+
+    def _write_record(self, f, name, data, flags=0):
+        encoded = name.encode("utf-8")
+        f.write(self.RECORD.pack(self.RECORD_MAGIC, flags, len(encoded), len(data)))
+        f.write(encoded)
+        data_offset = f.tell()
+        f.write(data)
+        return data_offset
+
+    def _append_record(self, name, data, flags=0):
+        with open(self.path, "ab") as f:
+            data_offset = self._write_record(f, name, data, flags)
+            f.flush()
+            os.fsync(f.fileno())
+        return data_offset
+
+    def names(self):
+        with self.lock:
+            return list(self.entries)
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def append(self, name, data):
+        """Store encoded image bytes, replacing any earlier entry with the same name"""
+        self.append_many([(name, data)])
+
+    def append_many(self, items):
+        """Append (name, data) pairs with a single fsync, index write and remap"""
+        with self.lock:
+            with open(self.path, "ab") as f:
+                for name, data in items:
+                    if name in self.entries:
+                        self.dead_bytes += self.RECORD.size + len(name.encode("utf-8")) + self.entries[name][1]
+                    self.entries[name] = (self._write_record(f, name, data), len(data))
+                f.flush()
+                os.fsync(f.fileno())
+            self._save_index()
+            self._remap()
+        self.maybe_compact()
+
+    def delete(self, name):
+        with self.lock:
+            if name not in self.entries:
+                return False
+            offset, length = self.entries.pop(name)
+            encoded_len = len(name.encode("utf-8"))
+            self._append_record(name, b"", flags=self.FLAG_DELETED)
+            self.dead_bytes += 2 * (self.RECORD.size + encoded_len) + length
+            self._save_index()
+            self._remap()
+        self.maybe_compact()
+        return True
+
+    @contextmanager
+    def open_view(self, name):
+        """Yield a zero-copy memoryview of an entry's encoded bytes"""
+        with self.lock:
+            offset, length = self.entries[name]
+            view = memoryview(self._mmap)[offset:offset + length]
+        try:
+            yield view
+        finally:
+            view.release()
+
+    @contextmanager
+    def open_stream(self, name):
+        """Yield a file-like object over an entry, usable with Image.open"""
+        with self.open_view(name) as view:
+            reader = _PackEntryReader(view)
+            try:
+                yield io.BufferedReader(reader)
+            finally:
+                reader.view = None
+
+    def read(self, name):
+        with self.open_view(name) as view:
+            return bytes(view)
+
+    def extract(self, name, dest_path):
+        """Stream an entry out to a file without an intermediate copy"""
+        with self.open_view(name) as view, open(dest_path, "wb") as f:
+            f.write(view)
+        return dest_path
+
+    def maybe_compact(self):
+        """Compact in the background once deleted data passes LIBRARY_PACK_COMPACT_RATIO"""
+        size = os.path.getsize(self.path)
+        if size and self.dead_bytes / size >= LIBRARY_PACK_COMPACT_RATIO:
+            threading.Thread(target=self.compact, daemon=True).start()
+
+    def compact(self):
+        """Rewrite the pack with only live entries"""
+        with self.lock:
+            tmp_path = self.path + ".tmp"
+            entries = {}
+            # Offsets change, so the compacted pack gets a new ID
+            header = self._new_header()
+            with open(tmp_path, "wb") as f:
+                f.write(header)
+                for name, (offset, length) in self.entries.items():
+                    entries[name] = (self._write_record(f, name, self._mmap[offset:offset + length]), length)
+                f.flush()
+                os.fsync(f.fileno())
+            try:
+                # Windows cannot replace a mapped file; back off if a view is still in use
+                self._mmap.close()
+            except BufferError:
+                os.remove(tmp_path)
+                logger.debug("Pack is in use, postponing compaction")
+                return False
+            self._file.close()
+            reclaimed = self.dead_bytes
+            try:
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                # e.g. another process has the pack open on Windows; keep serving the old file
+                logger.warning(f"Could not replace library pack, postponing compaction: {e}")
+                os.remove(tmp_path)
+                self._file = open(self.path, "rb")
+                self._remap()
+                return False
+            self.entries = entries
+            self.dead_bytes = 0
+            self.pack_id = self.FILE_HEADER.unpack(header)[2]
+            self._file = open(self.path, "rb")
+            self._remap()
+            self._save_index()
+        logger.info(f"Compacted library pack, reclaimed {reclaimed / (1024 * 1024):.1f} MB")
+        return True
+
+    def close(self):
+        with self.lock:
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass
+            self._file.close()
+
+_library_pack = None
+
+def get_library_pack():
+    """Open the library pack on first use"""
+    global _library_pack
+    if _library_pack is None:
+        _library_pack = WallpaperPack()
+    return _library_pack
+
+@contextmanager
+def open_library_image(info, filename):
+    """Yield something Image.open accepts for a library entry, loose file or packed"""
+    if os.path.exists(info['path']):
+        yield info['path']
+    elif info.get('packed') and os.path.exists(LIBRARY_PACK_FILE) and filename in get_library_pack():
+        with get_library_pack().open_stream(filename) as stream:
+            yield stream
+    else:
+        raise FileNotFoundError(info['path'])
+
+@contextmanager
+def open_saved_image(saved_path):
+    """Like open_library_image, for a path returned by save_generated_image"""
+    if not saved_path:
+        raise FileNotFoundError("No library copy was saved")
+    info = {'path': saved_path, 'packed': True}
+    with open_library_image(info, os.path.basename(saved_path)) as source:
+        yield source
+
+def delete_library_entry(filename):
+    """Remove a wallpaper from the library along with its loose file or packed entry"""
+    with _metadata_lock:
+        with open(METADATA_FILE, 'r') as f:
+            metadata = json.load(f)
+        info = metadata.pop(filename, None)
+        if info is None:
+            return False
+        with open(METADATA_FILE, 'w') as f:
+            json.dump(metadata, f, indent=2)
+    if info.get('packed'):
+        if os.path.exists(LIBRARY_PACK_FILE):
+            # Leaves a tombstone; the pack compacts itself once enough is dead
+            get_library_pack().delete(filename)
+    elif os.path.exists(info['path']):
+        os.remove(info['path'])
+    logger.info(f"Deleted {filename} from the library")
+    return True
+
+def pack_library(remove_loose=True):
+    """Move every loose library image (and a copy of metadata.json) into the pack"""
+    ensure_wallpapers_dir()
+    pack = get_library_pack()
+    with _metadata_lock:
+        with open(METADATA_FILE, 'r') as f:
+            metadata = json.load(f)
+        packed_paths = []
+
+        def loose_images():
+            for filename, info in metadata.items():
+                if not os.path.exists(info['path']):
+                    continue
+                with open(info['path'], "rb") as f:
+                    yield filename, f.read()
+                info['packed'] = True
+                packed_paths.append(info['path'])
+            # Carry the metadata along so the pack can be moved to another machine
+            yield METADATA_FILE_NAME, json.dumps(metadata, indent=2).encode("utf-8")
+
+        pack.append_many(loose_images())
+        # Record the move before deleting anything, so a crash never leaves entries without their images
+        write_durably(METADATA_FILE, json.dumps(metadata, indent=2).encode("utf-8"))
+    if remove_loose:
+        for path in packed_paths:
+            os.remove(path)
+    logger.info(f"Packed {len(packed_paths)} wallpapers into {LIBRARY_PACK_FILE}")
+    return len(packed_paths)
+
+def unpack_library():
+    """Write every packed image back out as a loose file and remove the pack"""
+    ensure_wallpapers_dir()
+    pack = get_library_pack()
+    with _metadata_lock:
+        with open(METADATA_FILE, 'r') as f:
+            metadata = json.load(f)
+        if METADATA_FILE_NAME in pack:
+            # Entries that only exist in a pack copied from another machine
+            for filename, info in json.loads(pack.read(METADATA_FILE_NAME)).items():
+                metadata.setdefault(filename, info)
+        unpacked = 0
+        for filename in pack.names():
+            if filename == METADATA_FILE_NAME:
+                continue
+            filepath = os.path.join(WALLPAPERS_DIR, filename)
+            pack.extract(filename, filepath)
+            info = metadata.setdefault(filename, {
+                'prompt': "Imported wallpaper",
+                'date': datetime.now().strftime("%Y%m%d_%H%M%S"),
+            })
+            info['path'] = filepath
+            info.pop('packed', None)
+            unpacked += 1
+        # Anything still marked packed was deleted from the pack
+        metadata = {name: info for name, info in metadata.items() if not info.get('packed')}
+        with open(METADATA_FILE, 'w') as f:
+            json.dump(metadata, f, indent=2)
+    close_library_pack()
+    os.remove(LIBRARY_PACK_FILE)
+    if os.path.exists(LIBRARY_PACK_FILE + ".idx"):
+        os.remove(LIBRARY_PACK_FILE + ".idx")
+    logger.info(f"Unpacked {unpacked} wallpapers from {LIBRARY_PACK_FILE}")
+    return unpacked
+
+def close_library_pack():
+    global _library_pack
+    if _library_pack is not None:
+        _library_pack.close()
+        _library_pack = None
+
+def scan_library_dir():
+    """Map each library image to its (inode, size, mtime_ns) using a single scandir pass"""
+    snapshot = {}
+    with os.scandir(WALLPAPERS_DIR) as entries:
+        for entry in entries:
+            if not entry.is_file() or not entry.name.lower().endswith(LIBRARY_IMAGE_EXTENSIONS):
+                continue
+            stat = entry.stat()
+            snapshot[entry.name] = [entry.inode(), stat.st_size, stat.st_mtime_ns]
+    return snapshot
+
+def reconcile_library(known_missing=()):
+    """Bring metadata.json in line with files added, moved or deleted outside the app.
+
+    Only files whose (inode, size, mtime) changed since the last snapshot are
+    examined for renames and imports. known_missing names entries found to be
+    unreadable, e.g. the one the user just clicked; they are dropped even if
+    packed. Returns True if the metadata was updated.
+    """
+    ensure_wallpapers_dir()
+    current = scan_library_dir()
+    try:
+        with open(LIBRARY_SNAPSHOT_FILE, 'r') as f:
+            previous = json.load(f)
+    except (FileNotFoundError, ValueError):
+        previous = {}
+
+    added = {name: sig for name, sig in current.items() if previous.get(name) != sig}
+    removed = {name: sig for name, sig in previous.items() if name not in current}
+
+    with _metadata_lock:
+        with open(METADATA_FILE, 'r') as f:
+            metadata = json.load(f)
+
+        # A file that vanished and reappeared with the same signature was renamed
+        moved_from = {tuple(sig): name for name, sig in removed.items()}
+        renames = {}
+        for name, sig in added.items():
+            old_name = moved_from.pop(tuple(sig), None)
+            if old_name in metadata and name not in metadata:
+                renames[old_name] = name
+
+        # Any loose entry without a file is missing, whether or not the snapshot knew it
+        missing = {name for name in metadata if name not in current and not metadata[name].get('packed')}
+        missing |= set(known_missing) & set(metadata)
+        missing -= set(renames)
+        orphans = [name for name in added if name not in metadata and name not in renames.values()]
+
+        updated = {}
+        for name, info in metadata.items():
+            if name in missing:
+                continue
+            if name in renames:
+                name = renames[name]
+                info = dict(info, path=os.path.join(WALLPAPERS_DIR, name))
+            updated[name] = info
+        for name in orphans:
+            mtime = datetime.fromtimestamp(current[name][2] / 1e9)
+            updated[name] = {
+                'prompt': "Imported wallpaper",
+                'date': mtime.strftime("%Y%m%d_%H%M%S"),
+                'path': os.path.join(WALLPAPERS_DIR, name)
+            }
+
+        changed = updated != metadata
+        if changed:
+            with open(METADATA_FILE, 'w') as f:
+                json.dump(updated, f, indent=2)
+        dropped_packed = [name for name in missing if metadata[name].get('packed')]
+
+    if dropped_packed and os.path.exists(LIBRARY_PACK_FILE):
+        pack = get_library_pack()
+        for name in dropped_packed:
+            pack.delete(name)
+    if current != previous:
+        with open(LIBRARY_SNAPSHOT_FILE, 'w') as f:
+            json.dump(current, f)
+    if changed:
+        logger.info(
+            f"Reconciled library: {len(orphans)} added, {len(renames)} moved, {len(missing)} missing"
+        )
+    return changed
+
+def schedule_library_reconcile(root, delay_ms=0):
+    """Reconcile in the background now and then every LIBRARY_RECONCILE_INTERVAL_MS"""
+    def run():
+        try:
+            if reconcile_library():
+                root.after(0, refresh_library_list)
+        except Exception as e:
+            logger.warning(f"Library reconciliation failed: {e}")
+        try:
+            root.after(LIBRARY_RECONCILE_INTERVAL_MS, start)
+        except (tk.TclError, RuntimeError):
+            # The root was released for tray mode; the next create_gui reschedules
+            pass
+
+    def start():
+        threading.Thread(target=run, daemon=True).start()
+
+    root.after(delay_ms, start)
+
+def get_prompt_category(prompt):
+    """Return the DEFAULT_PROMPTS category for a prompt, or None for custom prompts"""
+    for category, category_prompt in DEFAULT_PROMPTS.items():
+        if category_prompt == prompt:
+            return category
+    return None
+
+class DirectoryPoolBackend:
+    """Shared pool stored on a local or network directory"""
+    def __init__(self, root_dir):
+        self.root_dir = root_dir
+
+    def _path(self, name):
+        return os.path.join(self.root_dir, *name.split("/"))
+
+    def exists(self, name):
+        return os.path.exists(self._path(name))
+
+    def read(self, name):
+        try:
+            with open(self._path(name), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def write(self, name, data):
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a unique temp name so readers never see a partial file
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def read_versioned(self, name):
+        """Return (data, version) where version identifies the current content"""
+        data = self.read(name)
+        return data, hashlib.sha256(data).hexdigest() if data is not None else None
+
+    def write_if_unchanged(self, name, data, version):
+        """Write only if the content still matches version; False if someone else wrote first"""
+        lock_path = self._path(name) + ".lock"
+        os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) > POOL_LOCK_STALE_S:
+                    os.remove(lock_path)
+            except OSError:
+                pass
+            return False
+        try:
+            os.close(fd)
+            if self.read_versioned(name)[1] != version:
+                return False
+            self.write(name, data)
+            return True
+        finally:
+            try:
+                os.remove(lock_path)
+            except OSError:
+                pass
+
+class HttpPoolBackend:
+    """Shared pool served by a plain HTTP file server (GET to read, PUT to publish)"""
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+
+    def _url(self, name):
+        return f"{self.base_url}/{name}"
+
+    def exists(self, name):
+        response = self.session.head(self._url(name), timeout=POOL_HTTP_TIMEOUT)
+        return response.status_code == 200
+
+    def read(self, name):
+        response = self.session.get(self._url(name), timeout=POOL_HTTP_TIMEOUT)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.content
+
+    def write(self, name, data):
+        response = self.session.put(self._url(name), data=data, timeout=POOL_HTTP_TIMEOUT)
+        response.raise_for_status()
+
+    def read_versioned(self, name):
+        """Return (data, version) where version is the server's ETag"""
+        response = self.session.get(self._url(name), timeout=POOL_HTTP_TIMEOUT)
+        if response.status_code == 404:
+            return None, None
+        response.raise_for_status()
+        etag = response.headers.get("ETag")
+        if etag is None:
+            logger.warning(f"Pool server sent no ETag for {name}; index updates cannot detect concurrent writers")
+        return response.content, etag
+
+    def write_if_unchanged(self, name, data, version):
+        """Conditional PUT; False if the server reports the resource changed (412)"""
+        headers = {"If-Match": version} if version else {"If-None-Match": "*"}
+        response = self.session.put(self._url(name), data=data, headers=headers, timeout=POOL_HTTP_TIMEOUT)
+        if response.status_code == 412:
+            return False
+        response.raise_for_status()
+        return True
+
+class SharedWallpaperPool:
+    """Content-addressed pool of generated wallpapers shared between machines.
+
+    Only the index is synced eagerly; image bytes are fetched when an entry is
+    about to be shown and kept in a local cache keyed by their SHA-256.
+    """
+    def __init__(self, backend, cache_dir=POOL_CACHE_DIR):
+        self.backend = backend
+        self.cache_dir = cache_dir
+        self.seen_file = os.path.join(cache_dir, "seen.json")
+        self.entries = {}
+        self.last_sync = 0
+        self.lock = threading.Lock()
+        os.makedirs(os.path.join(cache_dir, "objects"), exist_ok=True)
+        self.seen = self._load_seen()
+
+    def _load_seen(self):
+        try:
+            with open(self.seen_file, 'r') as f:
+                return set(json.load(f))
+        except (FileNotFoundError, ValueError):
+            return set()
+
+    def _save_seen(self):
+        with open(self.seen_file, 'w') as f:
+            json.dump(sorted(self.seen), f)
+
+    @staticmethod
+    def _object_name(digest, ext):
+        return f"objects/{digest[:2]}/{digest}{ext}"
+
+    def _read_index(self):
+        data = self.backend.read(POOL_INDEX_NAME)
+        if not data:
+            return {}
+        return json.loads(data.decode("utf-8")).get("entries", {})
+
+    def sync_index(self, force=False):
+        """Refresh the local copy of the pool index if it is stale"""
+        with self.lock:
+            if not force and time.time() - self.last_sync < POOL_INDEX_TTL:
+                return self.entries
+            try:
+                self.entries = self._read_index()
+                self.last_sync = time.time()
+                logger.debug(f"Synced pool index: {len(self.entries)} entries")
+            except Exception as e:
+                logger.warning(f"Failed to sync shared pool index: {e}")
+            return self.entries
+
+    def pick(self, category):
+        """Choose an entry of the category this machine has not shown yet"""
+        self.sync_index()
+        candidates = [
+            (digest, entry) for digest, entry in self.entries.items()
+            if entry.get('category') == category and digest not in self.seen
+        ]
+        if not candidates:
+            return None
+        digest, entry = random.choice(candidates)
+        return dict(entry, hash=digest)
+
+    def fetch(self, entry, rendition=None):
+        """Return a local path to the entry's original or rendition, downloading it if needed"""
+        if rendition is None:
+            obj = entry['original']
+        else:
+            obj = entry.get('renditions', {}).get(rendition)
+            if obj is None:
+                return None
+        local_path = os.path.join(self.cache_dir, "objects", os.path.basename(obj))
+        if os.path.exists(local_path):
+            return local_path
+
+        data = self.backend.read(obj)
+        if data is None:
+            raise FileNotFoundError(f"Pool object missing: {obj}")
+        expected = os.path.splitext(os.path.basename(obj))[0]
+        if hashlib.sha256(data).hexdigest() != expected:
+            raise ValueError(f"Pool object failed hash check: {obj}")
+        # Cached objects are trusted without rehashing, so never expose a partial one
+        tmp_path = f"{local_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, local_path)
+        return local_path
+
+    def mark_seen(self, digest):
+        self.seen.add(digest)
+        self._save_seen()
+
+    def _put_object(self, source, ext=None):
+        """Upload a file given by path or an open binary stream"""
+        if isinstance(source, str):
+            with open(source, "rb") as f:
+                data = f.read()
+            ext = ext or os.path.splitext(source)[1].lower()
+        else:
+            data = source.read()
+        digest = hashlib.sha256(data).hexdigest()
+        name = self._object_name(digest, ext)
+        if not self.backend.exists(name):
+            self.backend.write(name, data)
+        return digest, name
+
+    def publish(self, original_path, category, prompt, rendition=None):
+        """Upload a generation and add it to the shared index.
+
+        rendition is the 4K library JPEG, as a path or a stream (e.g. from the library pack).
+        """
+        digest, original_name = self._put_object(original_path)
+        entry = {
+            'category': category,
+            'prompt': prompt,
+            'original': original_name,
+            'renditions': {},
+            'published': datetime.now().strftime("%Y%m%d_%H%M%S"),
+        }
+        if rendition is not None:
+            entry['renditions'][POOL_RENDITION] = self._put_object(rendition, ".jpg")[1]
+
+        with self.lock:
+            # Compare-and-swap: the write only lands if nobody changed the index since we read it
+            for attempt in range(POOL_INDEX_RETRIES):
+                data, version = self.backend.read_versioned(POOL_INDEX_NAME)
+                entries = json.loads(data.decode("utf-8")).get("entries", {}) if data else {}
+                entries[digest] = entry
+                payload = json.dumps({'version': 1, 'entries': entries}, indent=2)
+                if self.backend.write_if_unchanged(POOL_INDEX_NAME, payload.encode("utf-8"), version):
+                    break
+                time.sleep(random.uniform(0.05, 0.2) * (attempt + 1))
+            else:
+                raise RuntimeError("Shared pool index kept changing; giving up on publishing")
+            self.entries = entries
+            self.last_sync = time.time()
+        self.mark_seen(digest)
+        logger.info(f"Published wallpaper {digest[:12]} to shared pool ({category})")
+        return digest
+
+_shared_pool = None
+
+def get_shared_pool():
+    """Return the configured shared pool, or None when pooling is disabled"""
+    global _shared_pool
+    if _shared_pool is None and SHARED_POOL_LOCATION:
+        if SHARED_POOL_LOCATION.startswith(("http://", "https://")):
+            backend = HttpPoolBackend(SHARED_POOL_LOCATION)
+        else:
+            backend = DirectoryPoolBackend(SHARED_POOL_LOCATION)
+        _shared_pool = SharedWallpaperPool(backend)
+    return _shared_pool
+
+class JobJournal:
+    """Append-only record of generation job states so paid images survive crashes.
+
+    Each line is a JSON object holding the job ID, its new state and any fields
+    learned at that step (URL, download path, library path).
+    """
+    def __init__(self, path=JOB_JOURNAL_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def record(self, job_id, state, **fields):
+        entry = dict(fields, job=job_id, state=state, time=datetime.now().isoformat(timespec='seconds'))
+        with self.lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            line = (json.dumps(entry) + "\n").encode('utf-8')
+            with open(self.path, 'ab+') as f:
+                # Start on a fresh line if a crash left the last write torn
+                if f.seek(0, os.SEEK_END) > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        line = b"\n" + line
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+        logger.debug(f"Job {job_id}: {state}", extra={'job_id': job_id})
+
+    def maybe_compact(self):
+        """Compact once the journal passes JOB_JOURNAL_COMPACT_BYTES.
+
+        Called once a job is done with its files, never from record(), since
+        compacting drops the downloads of jobs that just became terminal.
+        """
+        try:
+            if os.path.getsize(self.path) > JOB_JOURNAL_COMPACT_BYTES:
+                self.compact()
+        except FileNotFoundError:
+            pass
+
+    def load(self):
+        """Replay the journal into one merged dict per job, in order of first appearance"""
+        jobs = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A torn final line from a crash mid-write
+                        continue
+                    jobs.setdefault(entry['job'], {}).update(entry)
+        except FileNotFoundError:
+            pass
+        return jobs
+
+    def incomplete(self):
+        return {job_id: job for job_id, job in self.load().items()
+                if job['state'] not in JOB_TERMINAL_STATES}
+
+    def compact(self):
+        """Rewrite the journal keeping only the merged state of unfinished jobs"""
+        with self.lock:
+            jobs = self.incomplete()
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for job in jobs.values():
+                    f.write(json.dumps(job) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+
+            # Drop downloads that no unfinished job refers to
+            if os.path.isdir(JOBS_DIR):
+                keep = {os.path.basename(get_job_download_path(job_id)) for job_id in jobs}
+                for name in os.listdir(JOBS_DIR):
+                    if name not in keep:
+                        try:
+                            os.remove(os.path.join(JOBS_DIR, name))
+                        except OSError as e:
+                            logger.debug(f"Could not remove stale job file {name}: {e}")
+        logger.debug(f"Compacted job journal to {len(jobs)} unfinished jobs")
+
+# Create global job journal
+job_journal = JobJournal()
+
+def get_job_download_path(job_id):
+    """Durable location for a job's downloaded image (survives TEMP_DIR cleanup)"""
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    return os.path.join(JOBS_DIR, f"{job_id}.png")
+
+def write_durably(path, data):
+    with open(path, "wb") as handler:
+        handler.write(data)
+        handler.flush()
+        os.fsync(handler.fileno())
+
+def resume_incomplete_jobs(jobs):
+    """Finish jobs interrupted after the API was paid, from their last durable step"""
+    recovered = []
+    for job_id, job in jobs.items():
+        try:
+            state = job['state']
+            if state == "requested":
+                # No URL was recorded, so there is nothing to recover
+                job_journal.record(job_id, "abandoned")
+                continue
+            # Count the attempt before trying, so a crash while resuming counts too
+            attempts = job.get('attempts', 0) + 1
+            if attempts > JOB_MAX_ATTEMPTS:
+                job_journal.record(job_id, "failed", reason=f"Gave up after {JOB_MAX_ATTEMPTS} resume attempts")
+                continue
+            job_journal.record(job_id, state, attempts=attempts)
+            logger.info(f"Job {job_id}: resuming from {state} (attempt {attempts})", extra={'job_id': job_id})
+
+            if state == "api_returned":
+                response = requests.get(job['url'], timeout=60)
+                if response.status_code != 200:
+                    job_journal.record(job_id, "failed", reason=f"Image URL returned {response.status_code}")
+                    continue
+                job['path'] = get_job_download_path(job_id)
+                write_durably(job['path'], response.content)
+                job_journal.record(job_id, "downloaded", path=job['path'])
+                state = "downloaded"
+
+            if state == "downloaded" and job.get('save_to_library', True):
+                job['saved_path'] = save_generated_image(job['path'], job['prompt'])
+                job_journal.record(job_id, "saved", saved_path=job['saved_path'])
+                refresh_library_list()
+            recovered.append(job_id)
+        except Exception as e:
+            logger.warning(f"Job {job_id}: could not resume, will retry next start: {e}")
+
+    # Only the most recent job should end up on the desktop; older ones are
+    # superseded only once a newer one has actually been applied
+    for index in range(len(recovered) - 1, -1, -1):
+        job_id = recovered[index]
+        job = jobs[job_id]
+        try:
+            applied = False
+            # The finished library copy beats reprocessing the raw download
+            if job.get('saved_path'):
+                try:
+                    with open_saved_image(job['saved_path']) as saved:
+                        resize_and_set_wallpaper(saved)
+                    applied = True
+                except FileNotFoundError:
+                    logger.info(f"Job {job_id}: library copy is gone, applying the download", extra={'job_id': job_id})
+            if not applied:
+                resize_and_set_wallpaper(job['path'])
+        except Exception as e:
+            logger.warning(f"Job {job_id}: could not apply, trying an older job: {e}")
+            continue
+        job_journal.record(job_id, "applied")
+        for older_id in recovered[:index]:
+            job_journal.record(older_id, "superseded")
+        break
+    job_journal.compact()
+
 class LoadingDialog:
     def __init__(self, parent):
         self.top = Toplevel(parent)
@@ -354,56 +1793,132 @@ class LoadingDialog:
 def generate_wallpaper(prompt, status_label, root, save_to_library=True):
     loading = None
     temp_path = None
+    job_id = uuid.uuid4().hex[:8]
     try:
+        logger.info(f"Job {job_id}: generating wallpaper", extra={'job_id': job_id})
+        stage_start = stage_clock()
         loading = LoadingDialog(root)
         root.update()
         
-        # Step 1: Check API Key
-        api_key = load_api_key()
-        if not api_key:
-            loading.destroy()
-            messagebox.showerror("Error", "API key not found. Please enter and save your API key.")
-            return
+        # Step 1: Check the shared pool, then the API Key
+        pool = get_shared_pool()
+        category = get_prompt_category(prompt)
+        pool_entry = None
+        if pool and category:
+            try:
+                pool_entry = pool.pick(category)
+            except Exception as e:
+                logger.warning(f"Shared pool lookup failed: {e}")
+        
+        if pool_entry is None:
+            api_key = load_api_key()
+            if not api_key:
+                loading.destroy()
+                messagebox.showerror("Error", "API key not found. Please enter and save your API key.")
+                return
         
         # Step 2: Generate Image
         loading.advance()
-        url = "https://api.openai.com/v1/images/generations"
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
-        data = {
-            "prompt": prompt,
-            "n": 1,
-            "size": "1024x1024",
-            "response_format": "url",
-            "quality": "hd"
-        }
-        
-        response = requests.post(url, headers=headers, json=data)
-        if response.status_code != 200:
-            raise Exception(f"API Error: {response.json().get('error', {}).get('message', 'Unknown error')}")
+        if pool_entry is None:
+            job_journal.record(job_id, "requested", prompt=prompt, category=category,
+                               save_to_library=save_to_library)
+            url = "https://api.openai.com/v1/images/generations"
+            headers = {
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json"
+            }
+            data = {
+                "prompt": prompt,
+                "n": 1,
+                "size": "1024x1024",
+                "response_format": "url",
+                "quality": "hd"
+            }
+            
+            response = requests.post(url, headers=headers, json=data)
+            if response.status_code != 200:
+                job_journal.record(job_id, "failed", reason=f"API status {response.status_code}")
+                raise Exception(f"API Error: {response.json().get('error', {}).get('message', 'Unknown error')}")
+            stage_start = log_stage(job_id, "api_request", stage_start)
+        else:
+            logger.info(f"Job {job_id}: reusing pooled wallpaper {pool_entry['hash'][:12]}", extra={'job_id': job_id})
         
         # Step 3: Download Image
         loading.advance()
-        image_url = response.json()["data"][0]["url"]
-        img_data = requests.get(image_url).content
-        temp_path = get_temp_path("wallpaper.png")
-        with open(temp_path, "wb") as handler:
-            handler.write(img_data)
+        if pool_entry is None:
+            image_url = response.json()["data"][0]["url"]
+            job_journal.record(job_id, "api_returned", url=image_url)
+            img_data = requests.get(image_url).content
+            temp_path = get_job_download_path(job_id)
+            write_durably(temp_path, img_data)
+            job_journal.record(job_id, "downloaded", path=temp_path)
+            pool_rendition = False
+        else:
+            # The 4K rendition is all we need; the original is only fetched when there is none.
+            # Cached pool objects are read in place, then moved into the library or dropped.
+            temp_path = pool.fetch(pool_entry, POOL_RENDITION)
+            pool_rendition = temp_path is not None
+            if not pool_rendition:
+                temp_path = pool.fetch(pool_entry)
+        # Pool hits skip the API and mostly move a cached file, so they would skew the planner's averages
+        api_backed = pool_entry is None
+        stage_start = log_stage(job_id, "download", stage_start, sample=api_backed)
         
         # Step 4: Process Image
         loading.advance()
+        saved_path = None
+        # Pool renditions are used as-is elsewhere, so only a max-tier library copy may become one
+        library_tier = resolve_quality_tier()
         if save_to_library:
-            saved_path = save_generated_image(temp_path, prompt)
+            # A pooled rendition moves out of the cache instead of being stored twice
+            saved_path = save_generated_image(
+                temp_path, prompt, processed=pool_rendition, tier=library_tier, move=pool_rendition
+            )
             logger.info(f"Saved generated image to library: {saved_path}")
+            if pool_entry is None:
+                job_journal.record(job_id, "saved", saved_path=saved_path)
             # Refresh library list after saving
             refresh_library_list()
+        stage_start = log_stage(job_id, "process", stage_start, sample=api_backed)
+        
+        # Share new generations so other machines can skip the API call
+        if pool and category:
+            try:
+                if pool_entry is None and saved_path and library_tier == "max":
+                    with open_saved_image(saved_path) as rendition:
+                        pool.publish(temp_path, category, prompt, rendition=rendition)
+                elif pool_entry is None:
+                    pool.publish(temp_path, category, prompt)
+                else:
+                    pool.mark_seen(pool_entry['hash'])
+            except Exception as e:
+                logger.warning(f"Failed to update shared pool: {e}")
         
         # Step 5: Set Wallpaper
         loading.advance()
-        status = resize_and_set_wallpaper(temp_path)
+        # The library copy is already final, so applying it skips reprocessing
+        if saved_path:
+            with open_saved_image(saved_path) as source:
+                status = resize_and_set_wallpaper(source)
+        else:
+            status = resize_and_set_wallpaper(temp_path)
+        if pool_entry is None:
+            # The library copy (if any) is durable now; drop the download before the job turns terminal
+            try:
+                os.remove(temp_path)
+            except FileNotFoundError:
+                pass
+            job_journal.record(job_id, "applied")
+            job_journal.maybe_compact()
+        else:
+            # Each pooled image is shown once per machine, so its cached copy has served its purpose
+            try:
+                os.remove(temp_path)
+            except FileNotFoundError:
+                pass
         status_label.config(text=status, foreground="green")
+        log_stage(job_id, "apply", stage_start, sample=api_backed)
+        save_stage_stats()
         
         # Complete
         time.sleep(0.5)  # Short pause to show completion
@@ -411,7 +1926,7 @@ def generate_wallpaper(prompt, status_label, root, save_to_library=True):
         time.sleep(0.5)  # Show completed state briefly
         
     except Exception as e:
-        logger.exception("Error generating wallpaper")
+        logger.exception(f"Job {job_id}: error generating wallpaper", extra={'job_id': job_id})
         messagebox.showerror("Error", f"An error occurred: {e}")
     finally:
         if loading:
@@ -425,6 +1940,93 @@ def generate_wallpaper(prompt, status_label, root, save_to_library=True):
 
 # Add global variable for system tray icon
 _system_tray_icon = None
+_tray_icon_image = None
+
+# Widgets owned by build_main_ui, released while the app sits in the tray
+_main_ui_widgets = []
+_generation_running = threading.Event()
+_tray_released = threading.Event()  # The Tk root was destroyed for tray mode
+_show_requested = threading.Event()
+_quit_requested = threading.Event()
+
+def get_tray_icon_image():
+    """Build the tray icon image once and reuse it on every hide"""
+    global _tray_icon_image
+    if _tray_icon_image is None:
+        image = Image.new("RGB", (64, 64), (255, 255, 255))
+        draw = ImageDraw.Draw(image)
+        draw.rectangle([16, 16, 48, 48], fill="black")
+        _tray_icon_image = image
+    return _tray_icon_image
+
+def get_process_private_mb():
+    """Memory only this process holds, in MB: private bytes on Windows, USS elsewhere.
+
+    Unlike RSS (the working set on Windows) this does not drop when pages are
+    merely trimmed, so it reflects memory that was actually freed.
+    """
+    process = psutil.Process()
+    if sys.platform == "win32":
+        return process.memory_info().private / (1024 * 1024)
+    return process.memory_full_info().uss / (1024 * 1024)
+
+def trim_working_set():
+    """Ask Windows to page out memory the idle process is not touching"""
+    try:
+        handle = ctypes.windll.kernel32.GetCurrentProcess()
+        ctypes.windll.kernel32.SetProcessWorkingSetSize(handle, ctypes.c_size_t(-1), ctypes.c_size_t(-1))
+    except Exception as e:
+        logger.debug(f"Could not trim working set: {e}")
+
+def check_idle_memory():
+    """Compare private memory against TRAY_IDLE_MEMORY_TARGET_MB; returns (private_mb, within_target)"""
+    private_mb = get_process_private_mb()
+    within_target = private_mb <= TRAY_IDLE_MEMORY_TARGET_MB
+    if within_target:
+        logger.info(f"Tray idle memory {private_mb:.1f} MB (target {TRAY_IDLE_MEMORY_TARGET_MB} MB)")
+    else:
+        logger.warning(f"Tray idle memory {private_mb:.1f} MB exceeds target of {TRAY_IDLE_MEMORY_TARGET_MB} MB")
+    return private_mb, within_target
+
+def drop_idle_caches():
+    """Forget state that is cheap to rebuild when the UI comes back"""
+    if _shared_pool is not None:
+        with _shared_pool.lock:
+            _shared_pool.entries = {}
+            _shared_pool.last_sync = 0
+    if _apply_stager is not None:
+        with _apply_stager.lock:
+            staged = list(_apply_stager.staged.values())
+            _apply_stager.staged.clear()
+        staging_dir = os.path.abspath(_apply_stager.staging_dir)
+        for path in staged:
+            if os.path.dirname(path) == staging_dir:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+def release_gui(root):
+    """Destroy the Tk root, theme and widget tree while the app sits in the tray"""
+    global global_library_listbox, generate_button
+    if _generation_running.is_set() or root.state() != "withdrawn":
+        logger.debug("Window busy or shown again, keeping UI alive in tray")
+        return False
+    memory_before = get_process_private_mb()
+    _main_ui_widgets.clear()
+    global_library_listbox = None
+    generate_button = None
+
+    # Destroying the root ends mainloop; create_gui then returns to run_gui
+    _tray_released.set()
+    root.destroy()
+    Publisher.clear_subscribers()
+    Style.instance = None
+    drop_idle_caches()
+    gc.collect()
+    trim_working_set()
+    logger.info(f"Released UI for tray mode ({memory_before:.1f} MB private before release)")
+    return True
 
 # Update minimize_to_tray function
 def minimize_to_tray(root):
@@ -432,24 +2034,26 @@ def minimize_to_tray(root):
     
     def show_app(icon, item):
         icon.stop()
-        root.after(0, root.deiconify)
+        if _tray_released.is_set():
+            _show_requested.set()
+        else:
+            root.after(0, root.deiconify)
 
     def quit_app(icon, item):
         icon.stop()
-        root.after(0, root.quit)
+        if _tray_released.is_set():
+            _quit_requested.set()
+            _show_requested.set()
+        else:
+            root.after(0, root.quit)
 
     try:
-        # Create a system tray icon
-        image = Image.new("RGB", (64, 64), (255, 255, 255))
-        draw = ImageDraw.Draw(image)
-        draw.rectangle([16, 16, 48, 48], fill="black")
-
         menu = pystray.Menu(
             pystray.MenuItem("Show", show_app),
             pystray.MenuItem("Quit", quit_app),
         )
         
-        _system_tray_icon = pystray.Icon("Wallpaper AI Slideshow", image, "Wallpaper AI Slideshow", menu)
+        _system_tray_icon = pystray.Icon("Wallpaper AI Slideshow", get_tray_icon_image(), "Wallpaper AI Slideshow", menu)
         root.withdraw()
         
         # Run in separate thread
@@ -458,6 +2062,31 @@ def minimize_to_tray(root):
         logger.error(f"Failed to create system tray icon: {e}")
         messagebox.showerror("Error", "Failed to minimize to system tray")
         root.deiconify()  # Show window again if minimizing fails
+        return
+
+    # Tear down heavy UI state once the window is hidden
+    root.after(0, release_gui, root)
+
+def run_gui():
+    """Run the main window, rebuilding it whenever it comes back from the tray"""
+    restore_stage_samples()
+    # Finish generations interrupted by a crash or close before they were applied
+    threading.Thread(target=resume_incomplete_jobs, args=(job_journal.incomplete(),), daemon=True).start()
+
+    while True:
+        _tray_released.clear()
+        _show_requested.clear()
+        create_gui()
+        if not _tray_released.is_set():
+            break
+
+        # Idle in the tray with no Tk state until "Show" or "Quit"
+        if not _show_requested.wait(TRAY_MEMORY_CHECK_DELAY_S):
+            check_idle_memory()
+            _show_requested.wait()
+        if _quit_requested.is_set():
+            break
+        logger.info("Rebuilding UI from tray")
 
 # Add cleanup on exit
 def cleanup():
@@ -468,6 +2097,8 @@ def cleanup():
         # Clean up temp directory
         if os.path.exists(TEMP_DIR):
             shutil.rmtree(TEMP_DIR, ignore_errors=True)
+        if os.path.exists(STAGING_DIR):
+            shutil.rmtree(STAGING_DIR, ignore_errors=True)
             
     except Exception as e:
         logger.error(f"Error during cleanup: {e}")
@@ -516,14 +2147,40 @@ def open_file_location(event):
         if os.path.exists(filepath):
             # Use explorer to open and select the file
             subprocess.run(['explorer', '/select,', os.path.normpath(filepath)])
+        elif metadata[filename].get('packed') and os.path.exists(LIBRARY_PACK_FILE):
+            # Packed wallpapers live inside the pack file
+            subprocess.run(['explorer', '/select,', os.path.normpath(LIBRARY_PACK_FILE)])
         else:
             messagebox.showerror("Error", "Wallpaper file not found")
+            if reconcile_library(known_missing=[filename]):
+                refresh_library_list()
     except Exception as e:
         logger.error(f"Error opening file location: {e}")
         messagebox.showerror("Error", f"Could not open file location: {e}")
 
+def get_library_staging_key(filename, info):
+    return f"library:{filename}:{info.get('date')}:{_quality_tier}"
+
+def stage_selected_wallpaper(event=None):
+    """Prepare the selected library item so "Use Selected Wallpaper" is instant"""
+    selection = global_library_listbox.curselection()
+    if not selection:
+        return
+    try:
+        with open(METADATA_FILE, 'r') as f:
+            metadata = json.load(f)
+        filename = list(metadata.keys())[selection[0]]
+        info = metadata[filename]
+        get_apply_stager().stage(
+            get_library_staging_key(filename, info),
+            lambda: open_library_image(info, filename)
+        )
+    except Exception as e:
+        logger.debug(f"Could not stage selected wallpaper: {e}")
+
 def use_selected_wallpaper():
     """Set the selected wallpaper as current wallpaper"""
+    triggered_at = time.perf_counter()
     selection = global_library_listbox.curselection()
     if not selection:
         return
@@ -533,17 +2190,258 @@ def use_selected_wallpaper():
             metadata = json.load(f)
         
         filename = list(metadata.keys())[selection[0]]
-        filepath = metadata[filename]['path']
+        info = metadata[filename]
         
-        if os.path.exists(filepath):
-            status = resize_and_set_wallpaper(filepath)
-            return status
-        else:
+        try:
+            return get_apply_stager().apply(
+                get_library_staging_key(filename, info),
+                lambda: open_library_image(info, filename),
+                triggered_at
+            )
+        except FileNotFoundError:
             messagebox.showerror("Error", "Wallpaper file not found")
+            if reconcile_library(known_missing=[filename]):
+                refresh_library_list()
     except Exception as e:
         logger.error(f"Error using selected wallpaper: {e}")
         messagebox.showerror("Error", f"Could not set wallpaper: {e}")
 
+def delete_selected_wallpaper():
+    """Remove the selected wallpaper from the library after confirmation"""
+    selection = global_library_listbox.curselection()
+    if not selection:
+        return
+    
+    try:
+        with open(METADATA_FILE, 'r') as f:
+            metadata = json.load(f)
+        
+        filename = list(metadata.keys())[selection[0]]
+        if not messagebox.askyesno("Delete Wallpaper", f"Delete {filename} from the library?"):
+            return
+        if delete_library_entry(filename):
+            refresh_library_list()
+    except Exception as e:
+        logger.error(f"Error deleting selected wallpaper: {e}")
+        messagebox.showerror("Error", f"Could not delete wallpaper: {e}")
+
+def build_main_ui(root):
+    """Build the notebook and status bar; torn down again by release_gui"""
+    # Tabs
+    notebook = Notebook(root)
+    notebook.pack(expand=True, fill="both", padx=10, pady=10)
+
+    # API Key Tab (Add this new tab)
+    api_key_tab = Frame(notebook)
+    notebook.add(api_key_tab, text="API Key Settings")
+
+    Label(api_key_tab, text="OpenAI API Key:").pack(pady=5)
+    api_key_var = StringVar()
+    api_key_entry = Entry(api_key_tab, textvariable=api_key_var, width=40)
+    api_key_entry.pack(pady=5)
+
+    # Try to load existing API key
+    existing_key = load_api_key()
+    if existing_key:
+        api_key_var.set(existing_key)
+        Label(api_key_tab, text="✓ API key is saved", foreground="green").pack(pady=5)
+
+    def save_key():
+        key = api_key_var.get().strip()
+        if key:
+            try:
+                if save_api_key(key):
+                    messagebox.showinfo("Success", "API key saved successfully!")
+                    # Add success indicator label if not exists
+                    for widget in api_key_tab.winfo_children():
+                        if isinstance(widget, Label) and widget.cget("text") == "✓ API key is saved":
+                            break
+                    else:
+                        Label(api_key_tab, text="✓ API key is saved", foreground="green").pack(pady=5)
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to save API key: {e}")
+        else:
+            messagebox.showwarning("Warning", "Please enter an API key")
+
+    Button(api_key_tab, text="Save API Key", command=save_key).pack(pady=10)
+
+    # Add help text
+    help_text = """
+    To get your OpenAI API key:
+    1. Go to platform.openai.com
+    2. Sign in or create an account
+    3. Go to API keys section
+    4. Create a new API key
+    5. Copy and paste it here
+    """
+    Label(api_key_tab, text=help_text, justify=tk.LEFT, wraplength=500).pack(pady=20)
+
+    # Wallpaper Tab
+    wallpaper_tab = Frame(notebook)
+    notebook.add(wallpaper_tab, text="Wallpaper Settings")
+
+    Label(wallpaper_tab, text="Custom Prompt (optional):").pack(pady=5)
+    custom_prompt = StringVar()
+    prompt_entry = Entry(wallpaper_tab, textvariable=custom_prompt, width=40, state="disabled")
+    prompt_entry.pack(pady=5)
+
+    use_custom_prompt = IntVar(value=0)
+
+    def toggle_custom_prompt():
+        if use_custom_prompt.get():
+            prompt_entry.config(state="normal")
+        else:
+            prompt_entry.config(state="disabled")
+
+    Checkbutton(
+        wallpaper_tab, text="Use Custom Prompt", variable=use_custom_prompt, command=toggle_custom_prompt
+    ).pack(pady=5)
+
+    # Default Prompts Dropdown
+    Label(wallpaper_tab, text="Select Default Prompt:").pack(pady=5)
+    selected_prompt = StringVar(value="Random")
+    OptionMenu(wallpaper_tab, selected_prompt, *DEFAULT_PROMPTS.keys()).pack(pady=5)
+
+    # Interval Dropdown
+    Label(wallpaper_tab, text="Auto-Change Interval:").pack(pady=5)
+    interval_var = StringVar(value="Never")
+    intervals = ["Never", "1 hour", "2 hours", "3 hours", "6 hours", 
+                "12 hours", "24 hours", "5 minutes", "15 minutes", 
+                "30 minutes", "45 minutes", "60 minutes"]
+    OptionMenu(wallpaper_tab, interval_var, *intervals).pack(pady=5)
+
+    # Fleet size for capacity planning
+    Label(wallpaper_tab, text="Machines Sharing the API Key:").pack(pady=5)
+    fleet_var = StringVar(value="1")
+    Entry(wallpaper_tab, textvariable=fleet_var, width=8).pack(pady=5)
+
+    def get_planner_inputs():
+        minutes = parse_interval_minutes(interval_var.get())
+        try:
+            fleet_size = max(1, int(fleet_var.get()))
+        except ValueError:
+            fleet_size = 1
+        return minutes, fleet_size
+
+    # Add estimated cost label; runs on every keystroke, so it uses the analytic estimate
+    def update_cost_estimate(*args):
+        minutes, fleet_size = get_planner_inputs()
+        if minutes is None:
+            cost_text = "Cost: $0/month (Manual only)"
+        else:
+            spend, throttled_share = estimate_monthly_spend({minutes: 1.0}, fleet_size)
+            cost_text = f"Est. Cost: ${spend:.2f}/month"
+            if throttled_share > 0:
+                cost_text += f" ({throttled_share:.0%} throttled)"
+
+        cost_label.config(text=cost_text)
+
+    def show_capacity_report():
+        minutes, fleet_size = get_planner_inputs()
+        if minutes is None:
+            messagebox.showinfo("Capacity Plan", "Choose an auto-change interval to plan capacity.")
+            return
+
+        # Simulating a large fleet takes seconds, so keep it off the Tk thread
+        def run():
+            try:
+                report = format_capacity_report(plan_capacity({minutes: 1.0}, fleet_size))
+                root.after(0, lambda: messagebox.showinfo("Capacity Plan", report))
+            except Exception as e:
+                logger.error(f"Capacity planning failed: {e}")
+
+        threading.Thread(target=run, daemon=True).start()
+
+    cost_label = Label(wallpaper_tab, text="Cost: $0/month (Manual only)", 
+                      font=("Arial", 9), foreground="gray")
+    cost_label.pack(pady=2)
+    Button(wallpaper_tab, text="Capacity Plan", command=show_capacity_report).pack(pady=5)
+
+    # Bind interval and fleet changes to cost update
+    interval_var.trace('w', update_cost_estimate)
+    fleet_var.trace('w', update_cost_estimate)
+
+    # Status Label
+    status_label = Label(root, text="Welcome to Wallpaper AI Slideshow", font=("Arial", 10), anchor="w")
+    status_label.pack(fill="x", side="bottom", pady=5)
+    _main_ui_widgets.extend([notebook, status_label])
+
+    # Generate Now Button
+    def generate_now():
+        # Disable the generate button
+        generate_button.config(state='disabled')
+
+        prompt = (
+            custom_prompt.get()
+            if use_custom_prompt.get()
+            else DEFAULT_PROMPTS[selected_prompt.get()]
+            if selected_prompt.get() != "Random"
+            else random.choice(list(DEFAULT_PROMPTS.values()))
+        )
+
+        def generation_complete():
+            if generate_button is not None:
+                generate_button.config(state='normal')
+            root.update()
+
+        def run_generation():
+            _generation_running.set()
+            try:
+                generate_wallpaper(prompt, status_label, root)
+            finally:
+                _generation_running.clear()
+                root.after(0, generation_complete)
+
+        threading.Thread(target=run_generation, daemon=True).start()
+
+    # Store generate button as global
+    global generate_button
+    generate_button = Button(wallpaper_tab, text="Generate Wallpaper Now", command=generate_now)
+    generate_button.pack(pady=10)
+    Button(wallpaper_tab, text="Hide App", command=lambda: minimize_to_tray(root)).pack(pady=10)
+
+    # Processing quality tier
+    Label(wallpaper_tab, text="Processing Quality:").pack(pady=5)
+    quality_var = StringVar(value=_quality_tier)
+    OptionMenu(
+        wallpaper_tab, quality_var, _quality_tier, "auto", *QUALITY_TIERS.keys(),
+        command=set_quality_tier
+    ).pack(pady=5)
+
+    # Runtime switch for verbose logging
+    debug_logging = IntVar(value=int(logging.getLogger().isEnabledFor(logging.DEBUG)))
+    Checkbutton(
+        wallpaper_tab, text="Debug Logging", variable=debug_logging,
+        command=lambda: set_debug_logging(bool(debug_logging.get()))
+    ).pack(pady=5)
+
+    # Add Library Tab
+    library_tab = Frame(notebook)
+    notebook.add(library_tab, text="Wallpaper Library")
+
+    # Make library_listbox global
+    global global_library_listbox
+    global_library_listbox = tk.Listbox(library_tab, width=70, height=15)
+    global_library_listbox.pack(pady=5, padx=5)
+
+    # Rest of the library tab code remains the same
+    global_library_listbox.bind('<Double-Button-1>', open_file_location)
+    global_library_listbox.bind('<<ListboxSelect>>', stage_selected_wallpaper)
+
+    Button(library_tab, text="Use Selected Wallpaper", 
+           command=use_selected_wallpaper).pack(pady=5)
+    Button(library_tab, text="Delete Selected Wallpaper", 
+           command=delete_selected_wallpaper).pack(pady=5)
+    Button(library_tab, text="Refresh Library", 
+           command=refresh_library_list).pack(pady=5)
+
+    # Add tooltip label
+    Label(library_tab, text="Tip: Double-click to open file location", 
+          foreground="gray").pack(pady=5)
+
+    # Initial library load
+    refresh_library_list()
+
 def create_gui():
     try:
         style = Style(theme="flatly")  # Fluent Design Theme
@@ -587,173 +2485,10 @@ def create_gui():
         if not icon_set:
             logger.warning("Could not set app icon from any location")
         
-        # Tabs
-        notebook = Notebook(root)
-        notebook.pack(expand=True, fill="both", padx=10, pady=10)
-
-        # API Key Tab (Add this new tab)
-        api_key_tab = Frame(notebook)
-        notebook.add(api_key_tab, text="API Key Settings")
-        
-        Label(api_key_tab, text="OpenAI API Key:").pack(pady=5)
-        api_key_var = StringVar()
-        api_key_entry = Entry(api_key_tab, textvariable=api_key_var, width=40)
-        api_key_entry.pack(pady=5)
-        
-        # Try to load existing API key
-        existing_key = load_api_key()
-        if existing_key:
-            api_key_var.set(existing_key)
-            Label(api_key_tab, text="✓ API key is saved", foreground="green").pack(pady=5)
-        
-        def save_key():
-            key = api_key_var.get().strip()
-            if key:
-                try:
-                    if save_api_key(key):
-                        messagebox.showinfo("Success", "API key saved successfully!")
-                        # Add success indicator label if not exists
-                        for widget in api_key_tab.winfo_children():
-                            if isinstance(widget, Label) and widget.cget("text") == "✓ API key is saved":
-                                break
-                        else:
-                            Label(api_key_tab, text="✓ API key is saved", foreground="green").pack(pady=5)
-                except Exception as e:
-                    messagebox.showerror("Error", f"Failed to save API key: {e}")
-            else:
-                messagebox.showwarning("Warning", "Please enter an API key")
-        
-        Button(api_key_tab, text="Save API Key", command=save_key).pack(pady=10)
-        
-        # Add help text
-        help_text = """
-        To get your OpenAI API key:
-        1. Go to platform.openai.com
-        2. Sign in or create an account
-        3. Go to API keys section
-        4. Create a new API key
-        5. Copy and paste it here
-        """
-        Label(api_key_tab, text=help_text, justify=tk.LEFT, wraplength=500).pack(pady=20)
-
-        # Wallpaper Tab
-        wallpaper_tab = Frame(notebook)
-        notebook.add(wallpaper_tab, text="Wallpaper Settings")
-
-        Label(wallpaper_tab, text="Custom Prompt (optional):").pack(pady=5)
-        custom_prompt = StringVar()
-        prompt_entry = Entry(wallpaper_tab, textvariable=custom_prompt, width=40, state="disabled")
-        prompt_entry.pack(pady=5)
-
-        use_custom_prompt = IntVar(value=0)
-
-        def toggle_custom_prompt():
-            if use_custom_prompt.get():
-                prompt_entry.config(state="normal")
-            else:
-                prompt_entry.config(state="disabled")
-
-        Checkbutton(
-            wallpaper_tab, text="Use Custom Prompt", variable=use_custom_prompt, command=toggle_custom_prompt
-        ).pack(pady=5)
-
-        # Default Prompts Dropdown
-        Label(wallpaper_tab, text="Select Default Prompt:").pack(pady=5)
-        selected_prompt = StringVar(value="Random")
-        OptionMenu(wallpaper_tab, selected_prompt, *DEFAULT_PROMPTS.keys()).pack(pady=5)
-
-        # Interval Dropdown
-        Label(wallpaper_tab, text="Auto-Change Interval:").pack(pady=5)
-        interval_var = StringVar(value="Never")
-        intervals = ["Never", "1 hour", "2 hours", "3 hours", "6 hours", 
-                    "12 hours", "24 hours", "5 minutes", "15 minutes", 
-                    "30 minutes", "45 minutes", "60 minutes"]
-        OptionMenu(wallpaper_tab, interval_var, *intervals).pack(pady=5)
-
-        # Add estimated cost label
-        def update_cost_estimate(*args):
-            interval = interval_var.get()
-            if interval == "Never":
-                cost_text = "Cost: $0/month (Manual only)"
-            else:
-                # Parse interval to hours
-                if "hour" in interval:
-                    hours = float(interval.split()[0])
-                    images_per_month = (30 * 24) / hours
-                elif "minute" in interval:
-                    minutes = float(interval.split()[0])
-                    images_per_month = (30 * 24 * 60) / minutes
-                
-                cost_per_month = (images_per_month * 0.040)  # $0.040 per image
-                cost_text = f"Est. Cost: ${cost_per_month:.2f}/month"
-            
-            cost_label.config(text=cost_text)
-
-        cost_label = Label(wallpaper_tab, text="Cost: $0/month (Manual only)", 
-                          font=("Arial", 9), foreground="gray")
-        cost_label.pack(pady=2)
-        
-        # Bind interval change to cost update
-        interval_var.trace('w', update_cost_estimate)
+        build_main_ui(root)
 
-        # Status Label
-        status_label = Label(root, text="Welcome to Wallpaper AI Slideshow", font=("Arial", 10), anchor="w")
-        status_label.pack(fill="x", side="bottom", pady=5)
-
-        # Generate Now Button
-        def generate_now():
-            # Disable the generate button
-            generate_button.config(state='disabled')
-            
-            prompt = (
-                custom_prompt.get()
-                if use_custom_prompt.get()
-                else DEFAULT_PROMPTS[selected_prompt.get()]
-                if selected_prompt.get() != "Random"
-                else random.choice(list(DEFAULT_PROMPTS.values()))
-            )
-            
-            def generation_complete():
-                generate_button.config(state='normal')
-                root.update()
-            
-            def run_generation():
-                try:
-                    generate_wallpaper(prompt, status_label, root)
-                finally:
-                    root.after(0, generation_complete)
-            
-            threading.Thread(target=run_generation, daemon=True).start()
-
-        # Store generate button as global
-        global generate_button
-        generate_button = Button(wallpaper_tab, text="Generate Wallpaper Now", command=generate_now)
-        generate_button.pack(pady=10)
-        Button(wallpaper_tab, text="Hide App", command=lambda: minimize_to_tray(root)).pack(pady=10)
-
-        # Add Library Tab
-        library_tab = Frame(notebook)
-        notebook.add(library_tab, text="Wallpaper Library")
-        
-        # Make library_listbox global
-        global global_library_listbox
-        global_library_listbox = tk.Listbox(library_tab, width=70, height=15)
-        global_library_listbox.pack(pady=5, padx=5)
-        
-        # Rest of the library tab code remains the same
-        global_library_listbox.bind('<Double-Button-1>', open_file_location)
-        
-        Button(library_tab, text="Use Selected Wallpaper", 
-               command=use_selected_wallpaper).pack(pady=5)
-        Button(library_tab, text="Refresh Library", 
-               command=refresh_library_list).pack(pady=5)
-        
-        # Add tooltip label
-        Label(library_tab, text="Tip: Double-click to open file location", 
-              foreground="gray").pack(pady=5)
-
-        # Initial library load
-        refresh_library_list()
+        # Pick up files added, moved or deleted outside the app
+        schedule_library_reconcile(root)
 
         # Add cleanup on window close
         def on_closing():
@@ -819,6 +2554,38 @@ def check_startup():
 if __name__ == "__main__":
     logger = setup_logging()
     mutex = None
+
+    # Headless benchmark: python wallpaper_ai_slideshow.py --benchmark-tiers [image]
+    if "--benchmark-tiers" in sys.argv:
+        args = sys.argv[sys.argv.index("--benchmark-tiers") + 1:]
+        results = benchmark_quality_tiers(args[0] if args else None)
+        print(f"{'Tier':<10}{'ms/image':>10}{'SSIM vs max':>14}")
+        for tier, result in results.items():
+            print(f"{tier:<10}{result['ms_per_image']:>10.1f}{result['ssim_vs_max']:>14.4f}")
+        shutdown_logging()
+        sys.exit(0)
+
+    # Headless capacity plan: --capacity-report [fleet size] [mix, e.g. 60m:0.7,15m:0.3]
+    if "--capacity-report" in sys.argv:
+        args = sys.argv[sys.argv.index("--capacity-report") + 1:]
+        fleet_size = int(args[0]) if args else 1
+        schedule_mix = {}
+        for part in (args[1] if len(args) > 1 else "60m:1").split(","):
+            interval, _, share = part.partition(":")
+            schedule_mix[parse_interval_minutes(interval)] = float(share or 1)
+        restore_stage_samples()
+        print(format_capacity_report(plan_capacity(schedule_mix, fleet_size)))
+        shutdown_logging()
+        sys.exit(0)
+
+    # Library pack tooling: --pack-library / --unpack-library
+    if "--pack-library" in sys.argv or "--unpack-library" in sys.argv:
+        if "--pack-library" in sys.argv:
+            print(f"Packed {pack_library()} wallpapers into {LIBRARY_PACK_FILE}")
+        else:
+            print(f"Unpacked {unpack_library()} wallpapers into {WALLPAPERS_DIR}")
+        shutdown_logging()
+        sys.exit(0)
     
     try:
         logger.info("Application starting...")
@@ -843,7 +2610,7 @@ if __name__ == "__main__":
             sys.exit(1)
 
         # Start GUI
-        create_gui()
+        run_gui()
 
     except Exception as e:
         logger.exception("Fatal error occurred")
@@ -860,3 +2627,4 @@ if __name__ == "__main__":
                 pass
         cleanup()
         logger.info("Application shutting down")
+        shutdown_logging()
@@ -0,0 +1,184 @@
+"""
+Wallpaper apply staging for Wallpaper AI Slideshow
+Author: Anton Rosh
+License: MIT
+
+Kept free of Windows-only imports so the stager can be exercised with
+FakeWallpaperSetter on any platform.
+"""
+
+import os
+import time
+import threading
+import ctypes
+import hashlib
+import logging
+import shutil
+import tempfile
+from collections import OrderedDict
+
+from PIL import Image
+
+STAGING_DIR = os.path.join(tempfile.gettempdir(), "wallpaper_ai_slideshow_staged")
+MAX_STAGED_WALLPAPERS = 3
+DEFAULT_WALLPAPER_SIZE = (3840, 2160)  # Used when the screen resolution cannot be queried
+SPI_SETDESKWALLPAPER = 20
+DESKTOPVERTRES = 117
+DESKTOPHORZRES = 118
+
+logger = logging.getLogger(__name__)
+
+def get_screen_size():
+    """Physical resolution of the primary display, or DEFAULT_WALLPAPER_SIZE off Windows"""
+    try:
+        user32 = ctypes.windll.user32
+        gdi32 = ctypes.windll.gdi32
+    except AttributeError:
+        return DEFAULT_WALLPAPER_SIZE
+    hdc = user32.GetDC(0)
+    try:
+        # DESKTOP*RES report physical pixels even when the process is not DPI aware,
+        # unlike GetSystemMetrics which returns the scaled size
+        size = (gdi32.GetDeviceCaps(hdc, DESKTOPHORZRES), gdi32.GetDeviceCaps(hdc, DESKTOPVERTRES))
+    finally:
+        user32.ReleaseDC(0, hdc)
+    if not all(size):
+        logger.warning("Could not query the screen resolution, assuming 4K")
+        return DEFAULT_WALLPAPER_SIZE
+    return size
+
+class WindowsWallpaperSetter:
+    """Sets the desktop wallpaper through SystemParametersInfoW, prepared at the screen's resolution"""
+    format = "JPEG"
+    extension = ".jpg"
+
+    def __init__(self):
+        self.size = get_screen_size()
+        logger.debug(f"Wallpapers will be prepared at {self.size[0]}x{self.size[1]}")
+
+    def set(self, path):
+        ctypes.windll.user32.SystemParametersInfoW(SPI_SETDESKWALLPAPER, 0, path, 0)
+
+class FakeWallpaperSetter:
+    """Records applied paths instead of touching the desktop, e.g. to measure latency off Windows"""
+    size = DEFAULT_WALLPAPER_SIZE
+    format = "JPEG"
+    extension = ".jpg"
+
+    def __init__(self, size=None):
+        if size is not None:
+            self.size = tuple(size)
+        self.applied = []
+
+    def set(self, path):
+        self.applied.append((path, time.perf_counter()))
+
+class ApplyStager:
+    """Prepares wallpapers ahead of time so applying one only hands a path to the setter.
+
+    Sources are identified by a key and opened through a callable returning a
+    context manager that yields something Image.open accepts. Files that are
+    already in the setter's format and resolution are used in place; anything
+    else is converted with process(source, dest_path, size=setter.size).
+    """
+    def __init__(self, setter, process, staging_dir=STAGING_DIR, max_staged=MAX_STAGED_WALLPAPERS):
+        self.setter = setter
+        self.process = process
+        self.staging_dir = staging_dir
+        self.max_staged = max_staged
+        self.staged = OrderedDict()
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.last_latency_ms = None
+
+    def _prepare(self, key, opener):
+        with opener() as source:
+            with Image.open(source) as img:
+                ready = img.size == tuple(self.setter.size) and img.format == self.setter.format
+            if ready and isinstance(source, str):
+                return os.path.abspath(source)
+
+            os.makedirs(self.staging_dir, exist_ok=True)
+            digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+            staged_path = os.path.join(os.path.abspath(self.staging_dir), digest + self.setter.extension)
+            size = tuple(self.setter.size)
+            if isinstance(source, str):
+                self.process(source, staged_path, size=size)
+            else:
+                source.seek(0)
+                if ready:
+                    with open(staged_path, "wb") as f:
+                        shutil.copyfileobj(source, f)
+                else:
+                    self.process(source, staged_path, size=size)
+            return staged_path
+
+    def _store(self, key, path):
+        with self.lock:
+            self.staged[key] = path
+            self.staged.move_to_end(key)
+            while len(self.staged) > self.max_staged:
+                _, old_path = self.staged.popitem(last=False)
+                # Only remove our own copies, never library files used in place
+                if os.path.dirname(old_path) == os.path.abspath(self.staging_dir):
+                    try:
+                        os.remove(old_path)
+                    except OSError:
+                        pass
+
+    def _get_staged(self, key):
+        with self.lock:
+            path = self.staged.get(key)
+        return path if path and os.path.exists(path) else None
+
+    def stage(self, key, opener):
+        """Prepare a wallpaper in the background unless it is staged or being staged"""
+        with self.lock:
+            if key in self.pending:
+                return
+            done = threading.Event()
+            self.pending[key] = done
+        if self._get_staged(key):
+            with self.lock:
+                self.pending.pop(key, None)
+            done.set()
+            return
+
+        def run():
+            started = time.perf_counter()
+            try:
+                self._store(key, self._prepare(key, opener))
+                logger.debug(f"Staged wallpaper {key} in {(time.perf_counter() - started) * 1000:.0f} ms")
+            except Exception as e:
+                logger.warning(f"Failed to stage wallpaper {key}: {e}")
+            finally:
+                with self.lock:
+                    self.pending.pop(key, None)
+                done.set()
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def wait(self, key, timeout=None):
+        """Block until a running stage() for key finishes; True if key is staged"""
+        with self.lock:
+            pending = self.pending.get(key)
+        if pending:
+            pending.wait(timeout)
+        return self._get_staged(key) is not None
+
+    def apply(self, key, opener, triggered_at=None):
+        """Set the wallpaper, preparing it now only if it was not staged in advance"""
+        if triggered_at is None:
+            triggered_at = time.perf_counter()
+        # Finishing a running preparation beats starting over
+        self.wait(key)
+
+        path = self._get_staged(key)
+        if path is None:
+            path = self._prepare(key, opener)
+            self._store(key, path)
+        self.setter.set(path)
+
+        self.last_latency_ms = (time.perf_counter() - triggered_at) * 1000
+        logger.info(f"Applied wallpaper {key} {self.last_latency_ms:.0f} ms after trigger")
+        return "Wallpaper has been updated successfully!"